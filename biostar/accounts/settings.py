@@ -64,6 +64,9 @@ ADMIN_UPLOAD_SIZE = 1000
 
 MESSAGES_PER_PAGE = 5
 
+# How many messages are inserted in one query when notifying users.
+MESSAGE_BATCH_SIZE = 500
+
 
 # Additional middleware.
 MIDDLEWARE += [
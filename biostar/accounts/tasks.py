@@ -94,9 +94,13 @@ def create_messages(template, user_ids, sender=None, extra_context={}):
     """
     Create batch message from sender to a given recipient_list
     """
-    from biostar.accounts.models import User, Message, MessageBody
+    from biostar.accounts.models import User, Message, MessageBody, Profile
+    from biostar.accounts import util
+    from django.db.models import Count, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
 
-    rec_list = User.objects.filter(id__in=user_ids)
+    # Only existing users receive the message.
+    rec_ids = list(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
     # Get the sender
     name, email = settings.ADMINS[0]
     sender = sender or User.objects.filter(email=email).first() or User.objects.filter(is_superuser=True).first()
@@ -109,7 +113,17 @@ def create_messages(template, user_ids, sender=None, extra_context={}):
     context.update(extra_context)
     body = tmpl.render(context)
     html = mistune.markdown(body, escape=False)
+
+    # Every recipient shares the same body.
     body = MessageBody.objects.create(body=body, html=html)
 
-    for rec in rec_list:
-        Message.objects.create(sender=sender, recipient=rec, body=body)
+    # The sent date is normally filled by Message.save, which bulk_create skips.
+    now = util.now()
+    msgs = [Message(sender=sender, recipient_id=rid, body=body, sent_date=now) for rid in rec_ids]
+    Message.objects.bulk_create(msgs, batch_size=settings.MESSAGE_BATCH_SIZE)
+
+    # Set the new message counts in one statement. Counting the unread messages,
+    # rather than incrementing, also corrects stale counts of imported users.
+    unread = Message.objects.filter(recipient_id=OuterRef('user_id'), unread=True).order_by()
+    unread = unread.values('recipient_id').annotate(count=Count('id')).values('count')
+    Profile.objects.filter(user__id__in=rec_ids).update(new_messages=Coalesce(Subquery(unread), 0))
@@ -216,7 +216,27 @@ class ProfileTest(TestCase):
 
         self.assertEqual(response.status_code, 302)
 
+    def test_create_messages(self):
+        "Test sending a message to many users"
+        from biostar.accounts import tasks
 
+        users = [models.User.objects.create(username=f"user-{i}", email=f"user-{i}@l.com") for i in range(5)]
+        user_ids = [u.pk for u in users]
+
+        # New users may already have a welcome message.
+        profiles = models.Profile.objects.filter(user__in=users)
+        before = dict(profiles.values_list('user_id', 'new_messages'))
+
+        # Tasks are disabled in tests, call the undecorated function.
+        create_messages = tasks.create_messages.__wrapped__
+        create_messages(template="messages/welcome.md", user_ids=user_ids, sender=self.user)
+
+        msgs = models.Message.objects.filter(recipient__in=users, sender=self.user)
+        self.assertEqual(msgs.count(), len(users))
+        self.assertEqual(msgs.values('body').distinct().count(), 1, "Message body not shared.")
+
+        after = dict(profiles.values_list('user_id', 'new_messages'))
+        self.assertEqual({uid: after[uid] - before[uid] for uid in user_ids}, {uid: 1 for uid in user_ids})
 
     def test_banned_user_login(self):
         "Test banned user can not login "
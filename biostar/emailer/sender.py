@@ -1,6 +1,7 @@
 import logging
 import re
 import textwrap
+import time
 
 from django.core.mail import EmailMultiAlternatives
 from django.core.mail import send_mail, send_mass_mail, get_connection
@@ -149,3 +150,38 @@ def send_html_mail(subject, message, message_html, from_email, recipient_list):
     msg = EmailMultiAlternatives(subject, message, from_email, recipient_list)
     msg.attach_alternative(message_html, "text/html")
     msg.send(fail_silently=False)
+
+
+def send_batches(subject, message, message_html, from_email, batches, retries=3, wait=5):
+    """
+    Sends the same email to each batch of recipients over a single connection.
+    A failed batch is retried on a new connection, waiting longer after each attempt.
+    Returns the number of recipients and the number of failed batches.
+    """
+    connection = get_connection(fail_silently=False)
+
+    sent = failed = 0
+    try:
+        for recipient_list in batches:
+            for attempt in range(1, retries + 1):
+                try:
+                    # Does nothing when the connection is already open.
+                    connection.open()
+                    msg = EmailMultiAlternatives(subject, message, from_email, recipient_list, connection=connection)
+                    if message_html:
+                        msg.attach_alternative(message_html, "text/html")
+                    msg.send(fail_silently=False)
+                    sent += len(recipient_list)
+                    break
+                except Exception as exc:
+                    logger.error(f"batch of {len(recipient_list)} failed, attempt={attempt}: {exc}")
+                    # The server may have dropped the connection.
+                    connection.close()
+                    if attempt == retries:
+                        failed += 1
+                    else:
+                        time.sleep(wait * attempt)
+    finally:
+        connection.close()
+
+    return sent, failed
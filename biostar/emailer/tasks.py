@@ -27,6 +27,17 @@ def send_all():
             logger.error(f"send_all() error: {exc}")
 
 
+def base_context(subject=""):
+    """
+    Default context added to each email template.
+    """
+    port = f":{settings.HTTP_PORT}"if settings.HTTP_PORT else ""
+
+    context = dict(domain=settings.SITE_DOMAIN, protocol=settings.PROTOCOL,
+                   port=port, name=settings.SITE_NAME, subject=subject)
+    return context
+
+
 def send_email(template_name, recipient_list, extra_context={}, name="", from_email=None, subject="Subject",
                mass=False):
     """
@@ -55,10 +66,7 @@ def send_email(template_name, recipient_list, extra_context={}, name="", from_em
         email = sender.EmailTemplate(template_name)
 
         # Default context added to each template.
-        port = f":{settings.HTTP_PORT}"if settings.HTTP_PORT else ""
-
-        context = dict(domain=settings.SITE_DOMAIN, protocol=settings.PROTOCOL,
-                       port=port, name=settings.SITE_NAME, subject=subject)
+        context = base_context(subject=subject)
 
         # Additional context added to the template.
         context.update(extra_context)
@@ -8,7 +8,6 @@ from urllib.parse import urlencode
 from datetime import datetime, timedelta
 from urllib.parse import quote
 
-from django.core.cache import cache
 from django.conf import settings
 from django.db.models import Q, Count
 from django.shortcuts import reverse, redirect
@@ -18,8 +17,8 @@ from django.http import JsonResponse
 from whoosh.searching import Results
 
 from biostar.accounts.models import Profile, User
-from . import auth, util, forms, tasks, search, views, const, moderate
-from .models import Post, Vote, Subscription, delete_post_cache
+from . import auth, util, forms, tasks, views, moderate
+from .models import Post, Vote, Subscription, Similar, delete_post_cache
 
 def ajax_msg(msg, status, **kwargs):
     payload = dict(status=status, msg=msg)
@@ -392,23 +391,14 @@ def similar_posts(request, uid):
 
     post = Post.objects.filter(uid=uid).first()
     if not post:
-        ajax_error(msg='Post does not exist.')
-
-    template_name = 'widgets/similar_posts.html'
-    cache_key = f"{const.SIMILAR_CACHE_KEY}-{post.uid}"
-    results = cache.get(cache_key)
-
-    if results is None:
-        logger.debug("Setting similar posts cache.")
-        # Do a more like this search on post
-        similar = search.more_like_this(uid=post.uid)
-        # Render template with posts
-        tmpl = loader.get_template(template_name)
-        context = dict(results=similar)
-        results = tmpl.render(context)
-
-        # Expire in one week if results exists, one hour if not.
-        expire = 3600 * 24 * 7 if len(similar) > 1 else 3600
-        cache.set(cache_key, results, expire)
+        return ajax_error(msg='Post does not exist.')
+
+    # Similar posts are precomputed by the similar task, the lookup is a single indexed read.
+    found = Similar.objects.filter(post=post).first()
+    similar = found.hits if found else []
+
+    # Render template with posts
+    tmpl = loader.get_template('widgets/similar_posts.html')
+    results = tmpl.render(dict(results=similar))
 
     return ajax_success(html=results, msg="success")
@@ -1,9 +1,8 @@
 
 import json
-import os
 import logging
-from os.path import join, normpath
 from django.core.cache import cache
+from django.db.models import Count, Q
 from django.conf import settings
 from datetime import datetime, timedelta
 
@@ -11,38 +10,33 @@ from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from biostar.accounts.models import Profile, User
 from . import util
-from .models import Post, Vote, Subscription, PostView
+from .models import Post, Vote, PostView, DailyStats
 
 
 logger = logging.getLogger("engine")
 
+# Cache key for the traffic numbers.
+TRAFFIC_CACHE_KEY = "traffic"
+
 
 def api_error(msg="Api Error"):
     return {'error': msg}
 
 
-def stat_file(date, data=None, load=False, dump=False):
-
-    os.makedirs(settings.STATS_DIR, exist_ok=True)
-    file_name = f'{date.year}-{date.month}-{date.day}.json'
-    file_path = normpath(join(settings.STATS_DIR, file_name))
-
-    def load_file():
-        # This will be FileNotFoundError in Python3.
-        if not os.path.isfile(file_path):
-            raise IOError
-        with open(file_path, 'r') as fin:
-            return json.loads(fin.read())
-
-    def dump_into_file():
-        with open(file_path, 'w') as fout:
-            fout.write(json.dumps(data))
+def get_day_zero():
+    """
+    Date of the first post, cached for a week.
+    """
+    day_zero = cache.get('day_zero')
 
-    if load:
-        return load_file()
+    if day_zero is None:
+        first = Post.objects.order_by('creation_date').values_list('creation_date', flat=True).first()
+        if first is None:
+            return None
+        day_zero = first
+        cache.set('day_zero', day_zero, 60 * 60 * 24 * 7)  # Cache valid for a week.
 
-    if dump:
-        return dump_into_file()
+    return day_zero
 
 
 def get_counts(end):
@@ -67,7 +61,7 @@ def get_counts(end):
 def compute_stats(date):
     """
     Statistics about this website for the given date.
-    Statistics are stored to a json file for caching purpose.
+    The totals are read from the daily rollups, days without a rollup (the current day) are counted.
 
     Parameters:
     date -- a `datetime`.
@@ -76,10 +70,11 @@ def compute_stats(date):
     start = date.date()
     end = start + timedelta(days=1)
 
-    try:
-        return stat_file(date=start, load=True)
-    except Exception as exc:  # This will be FileNotFoundError in Python3.
-        logger.info('No stats file for {}.'.format(start))
+    stats = DailyStats.objects.filter(date=start).first()
+    if stats:
+        totals = {key: getattr(stats, key) for key in DailyStats.TOTALS}
+    else:
+        totals = get_counts(end=end)
 
     new_users = Profile.objects.filter(date_joined__gte=start,
                                        date_joined__lt=end).values_list("uid", flat=True)
@@ -96,10 +91,7 @@ def compute_stats(date):
         'new_votes': list(new_votes),
     }
 
-    data.update(get_counts(end=end))
-
-    if not settings.DEBUG:
-        stat_file(dump=True, date=start, data=data)
+    data.update(totals)
 
     return data
 
@@ -136,16 +128,10 @@ def daily_stats_on_day(request, day):
     Parameters:
     day -- a day, given as a number of days from day-0 (the day of the first post).
     """
-    day_zero = cache.get('day_zero')
-
-    first_post = Post.objects.order_by('creation_date').only('creation_date')
-
-    if day_zero is None and not first_post:
-        return False
+    day_zero = get_day_zero()
 
     if day_zero is None:
-        day_zero = first_post[0].creation_date
-        cache.set('day_zero', day_zero, 60 * 60 * 24 * 7)  # Cache valid for a week.
+        return False
 
     date = day_zero + timedelta(days=int(day))
 
@@ -174,21 +160,48 @@ def daily_stats_on_date(request, year, month, day):
     return compute_stats(date)
 
 
+@json_response
+def daily_stats_range(request, start, end):
+    """
+    Statistics about this website for every day in a range of dates.
+
+    Parameters:
+    start -- first date, ISO 8601 format.
+    end -- last date, ISO 8601 format.
+    """
+    start = datetime.strptime(start, "%Y-%m-%d").date()
+    end = datetime.strptime(end, "%Y-%m-%d").date()
+
+    # Limit how many days are returned at once.
+    end = min(end, start + timedelta(days=settings.STATS_RANGE_MAX - 1))
+
+    stats = DailyStats.objects.filter(date__gte=start, date__lte=end).order_by('date')
+    data = [obj.as_dict() for obj in stats]
+
+    return data
+
+
 @json_response
 def traffic(request):
     """
     Traffic as post views in the last 60 min.
     """
+    data = cache.get(TRAFFIC_CACHE_KEY)
+    if data:
+        return data
+
     now = datetime.now()
     start = now - timedelta(minutes=60)
 
-    post_views = PostView.objects.filter(date__gt=start).exclude(date__gt=now).distinct('ip').count()
+    post_views = PostView.objects.filter(date__gt=start).exclude(date__gt=now).values('ip').distinct().count()
 
     data = {
         'date': util.datetime_to_iso(now),
         'timestamp': util.datetime_to_unix(now),
         'post_views_last_60_min': post_views,
     }
+    cache.set(TRAFFIC_CACHE_KEY, data, settings.TRAFFIC_CACHE_TIMEOUT)
+
     return data
 
 
@@ -318,28 +331,21 @@ def tags_list(request):
     weeks = months * 4
 
     delta = util.now() - timedelta(weeks=weeks)
-    query = Post.objects.filter(lastedit_date__gt=delta)
 
     # Iterate over tags and collect counts.
     lines = tags.readlines() if tags else []
-
-    data = {}
-
-    for line in lines:
-        tag = line.decode().lower().strip()
-        if not tag:
-            continue
-
-        # Get posts with this tag, that have been answered
-        posts = query.filter(tags__name=tag.lower(), is_toplevel=True)
-        uids = posts.values_list('uid', flat=True)
-
-        # Filter so the count is only 1 answer per questions
-        answer_count = Post.objects.filter(uid__in=uids, answer_count__gte=1).count()
-        comment_count = Post.objects.filter(uid__in=uids, comment_count__gte=1).count()
-        total = len(uids)
-
-        val = dict(total=total, answer_count=answer_count, comment_count=comment_count)
-        data.setdefault(tag, {}).update(val)
+    names = {line.decode().lower().strip() for line in lines}
+    names.discard('')
+
+    # Count the recent top level posts for all tags in a single query.
+    posts = Post.objects.filter(lastedit_date__gt=delta, is_toplevel=True, tags__name__in=names)
+    counts = posts.values('tags__name').annotate(total=Count('id'),
+                                                 answer_count=Count('id', filter=Q(answer_count__gte=1)),
+                                                 comment_count=Count('id', filter=Q(comment_count__gte=1)))
+
+    data = {name: dict(total=0, answer_count=0, comment_count=0) for name in names}
+    for row in counts:
+        name = row.pop('tags__name')
+        data[name].update(row)
 
     return data
@@ -14,14 +14,13 @@ from django.utils.safestring import mark_safe
 from django.conf import settings
 
 from biostar.accounts.const import MESSAGE_COUNT
-from biostar.accounts.models import Message
-from biostar.planet.models import BlogPost
 # Needed for historical reasons.
 from biostar.accounts.models import Profile
 from biostar.utils.helpers import get_ip
-from . import util, awards
+from taggit.models import Tag
+from . import util, awards, counters
 from .const import *
-from .models import Post, Vote, Subscription, Badge, delete_post_cache, Log
+from .models import Post, Vote, Subscription, Badge, Award, TagStats, delete_post_cache, thread_cache_key, Log
 
 User = get_user_model()
 
@@ -265,24 +264,59 @@ def is_suspended(user):
     return False
 
 
-def post_tree(user, root):
+def thread_version(root):
     """
-    Populates a tree that contains all posts in the thread.
+    Root fields that change whenever a post in the thread is added, edited, moved, voted or moderated.
+    """
+    return (root.lastedit_date, root.reply_count, root.answer_count, root.comment_count,
+            root.thread_votecount, root.accept_count, root.status, root.spam)
 
-    Answers sorted before comments.
+
+def thread_snapshot(user, root):
     """
+    Returns the sorted posts in the thread and the comment tree, cached until the thread changes.
+    The posts carry no user specific information.
+    """
+    moderator = user.is_authenticated and user.profile.is_moderator
+    key = thread_cache_key(root.uid, moderator)
+    version = thread_version(root)
+
+    cached = cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
 
     # Get all posts that belong to post root.
     query = Post.objects.valid_posts(u=user, root=root).exclude(pk=root.id)
 
     # Filter spam/deleted comments or answers.
-    if user.is_anonymous or not user.profile.is_moderator:
+    if not moderator:
         query = query.exclude(Q(status=Post.DELETED) | Q(spam=Post.SPAM))
 
     query = query.select_related("lastedit_user__profile", "author__profile", "root__author__profile")
 
     # Apply the sort order to all posts in thread.
-    thread = query.order_by("type", "-accept_count", "-vote_count", "creation_date")
+    thread = list(query.order_by("type", "-accept_count", "-vote_count", "creation_date"))
+
+    # Build comments tree, it holds the same objects as the thread.
+    tree = dict()
+    for post in thread:
+        if post.is_comment:
+            tree.setdefault(post.parent_id, []).append(post)
+
+    cache.set(key, (version, thread, tree), settings.THREAD_CACHE_TIMEOUT)
+
+    return thread, tree
+
+
+def post_tree(user, root):
+    """
+    Populates a tree that contains all posts in the thread.
+
+    Answers sorted before comments.
+    """
+
+    # The posts are shared by every user, the votes and permissions are added below.
+    thread, comment_tree = thread_snapshot(user=user, root=root)
 
     # Gather votes by the current user.
     votes = get_votes(user=user, root=root)
@@ -290,13 +324,8 @@ def post_tree(user, root):
     # Shortcuts to each storage.
     bookmarks, upvotes = votes[Vote.BOOKMARK], votes[Vote.UP]
 
-    # Build comments tree.
-    comment_tree = dict()
-
     def decorate(post):
         # Mutates the elements! Not worth creating copies.
-        if post.is_comment:
-            comment_tree.setdefault(post.parent_id, []).append(post)
         post.has_bookmark = int(post.id in bookmarks)
         post.has_upvote = int(post.id in upvotes)
         if user.is_authenticated:
@@ -322,50 +351,51 @@ def post_tree(user, root):
     return root, comment_tree, answers, thread
 
 
-def valid_awards(user):
+def valid_awards(users):
     """
-    Return list of valid awards for a given user
+    Return the list of new awards earned by a queryset of users.
+    Each award rule runs as a single query over all the users.
     """
+    from collections import Counter
 
-    valid = []
-    # Randomly go from one badge to the other
-    for award in awards.ALL_AWARDS:
-
-        # Valid award targets the user has earned
-        targets = award.get_awards(user)
+    # Badge ids are looked up once per run.
+    badges = dict(Badge.objects.values_list("name", "id"))
 
-        for target in targets:
-            post = target if isinstance(target, Post) else None
-            date = post.lastedit_date if post else user.profile.last_login
-            badge = Badge.objects.filter(name=award.name).first()
+    # How many times each user has won each badge.
+    won = Award.objects.filter(user__in=users).values_list("badge_id", "user_id")
+    counts = Counter(won)
 
-            valid.append((user, badge, date, post))
-
-    return valid
+    # Posts awarded in this run.
+    posts = set()
 
+    valid = []
+    for award in awards.ALL_AWARDS:
+        badge_id = badges.get(award.name)
+        if not badge_id:
+            continue
 
-def get_counts(user):
-    # The number of new messages since last visit.
-    message_count = Message.objects.filter(recipient=user, unread=True)[:1000].count()
-
-    # The number of new votes since last visit.
-    vote_count = Vote.objects.filter(post__author=user, date__gte=user.profile.last_login).exclude(
-        author=user)[:1000].count()
+        try:
+            targets = award.get_targets(users)
+        except Exception as exc:
+            logger.error(f"validator error {award.name}: {exc}")
+            continue
 
-    # Planet count since last visit
-    planet_count = BlogPost.objects.filter(rank__gte=user.profile.last_login)[:100].count()
+        for user_id, post_id, date in targets:
 
-    # Spam count since last visit.
-    spam_count = Post.objects.filter(spam=Post.SPAM, creation_date__gte=user.profile.last_login)[:1000].count()
+            # A post earns a single award.
+            if post_id:
+                if post_id in posts:
+                    continue
+                posts.add(post_id)
 
-    # Moderation actions since last visit.
-    mod_count = Log.objects.filter(date__gte=user.profile.last_login)[:100].count()
+            # Ensure users do not get over rewarded.
+            elif award.max and counts[(badge_id, user_id)] >= award.max:
+                continue
 
-    # Store the counts into the session.
-    counts = dict(mod_count=mod_count, spam_count=spam_count, planet_count=planet_count, message_count=message_count,
-                  vote_count=vote_count)
+            counts[(badge_id, user_id)] += 1
+            valid.append(Award(badge_id=badge_id, user_id=user_id, post_id=post_id, date=date or util.now()))
 
-    return counts
+    return valid
 
 
 @transaction.atomic
@@ -386,35 +416,143 @@ def apply_vote(post, user, vote_type):
         change = 0
         return msg, vote, change
 
+    # Count the new vote for the author of the post.
+    if change > 0:
+        counters.incr(counters.VOTES, user_id=post.author_id)
+
     # Fetch update the user score.
     Profile.objects.filter(user=post.author).update(score=F('score') + change)
 
-    # Calculate counts for the current post
-    votes = list(Vote.objects.filter(post=post).exclude(author=post.author))
-    vote_count = len(votes)
-    bookcount = len(list(filter(lambda v: v.type == Vote.BOOKMARK, votes)))
-    accept_count = len(list(filter(lambda v: v.type == Vote.ACCEPT, votes)))
-
-    # Increment the post vote count.
-    Post.objects.filter(uid=post.uid).update(vote_count=vote_count)
-
-    # The thread vote count represents all votes in a thread
-    Post.objects.filter(uid=post.root.uid).update(thread_votecount=F('thread_votecount') + change)
+    # Apply the change to the post counters, the cost does not depend on the number of votes.
+    counts = dict(vote_count=F('vote_count') + change)
 
     # Increment the bookmark count.
     if vote_type == Vote.BOOKMARK:
-        Post.objects.filter(uid=post.uid).update(book_count=bookcount)
+        counts.update(book_count=F('book_count') + change)
         # Reset bookmark cache
         delete_cache(BOOKMARKS, user)
 
     # Handle accepted vote.
     if vote_type == Vote.ACCEPT:
-        Post.objects.filter(uid=post.uid).update(accept_count=accept_count)
-        Post.objects.filter(uid=post.root.uid).update(accept_count=F('accept_count') + change)
+        counts.update(accept_count=F('accept_count') + change)
+
+    # The thread vote count represents all votes in a thread
+    if post.root_id == post.id:
+        counts.update(thread_votecount=F('thread_votecount') + change)
+    else:
+        root_counts = dict(thread_votecount=F('thread_votecount') + change)
+        if vote_type == Vote.ACCEPT:
+            root_counts.update(accept_count=F('accept_count') + change)
+        Post.objects.filter(pk=post.root_id).update(**root_counts)
+
+    Post.objects.filter(pk=post.pk).update(**counts)
 
     return msg, vote, change
 
 
+def update_tag_stats(tags):
+    """
+    Recounts the statistics for a queryset of tags, used by the batch reconciliation.
+    Returns the number of statistics rows that were created or changed.
+    """
+    from django.db.models import Count, Max
+
+    toplevel = Q(post__is_toplevel=True)
+    counts = tags.annotate(total=Count('post', filter=toplevel),
+                           answered=Count('post', filter=toplevel & Q(post__answer_count__gt=0)),
+                           commented=Count('post', filter=toplevel & Q(post__comment_count__gt=0)),
+                           last=Max('post__lastedit_date', filter=toplevel))
+    counts = counts.values_list('id', 'name', 'total', 'answered', 'commented', 'last')
+
+    fields = ['name', 'total', 'answered', 'commented', 'lastedit_date']
+    stats = TagStats.objects.in_bulk([row[0] for row in counts], field_name='tag_id')
+
+    created, changed = [], []
+    for tag_id, name, total, answered, commented, last in counts:
+        expected = dict(name=name, total=total, answered=answered, commented=commented, lastedit_date=last)
+        obj = stats.get(tag_id)
+        if obj is None:
+            created.append(TagStats(tag_id=tag_id, **expected))
+        elif any(getattr(obj, key) != value for key, value in expected.items()):
+            for key, value in expected.items():
+                setattr(obj, key, value)
+            changed.append(obj)
+
+    TagStats.objects.bulk_create(created)
+    TagStats.objects.bulk_update(changed, fields=fields)
+
+    return len(created) + len(changed)
+
+
+def change_tag_stats(names, total=0, answered=0, commented=0, date=None):
+    """
+    Applies count changes and the last edit date to the statistics of the tags.
+    """
+    if not names:
+        return
+
+    # Tags counted for the first time get a row.
+    if total > 0:
+        missing = Tag.objects.filter(name__in=names, stats__isnull=True)
+        TagStats.objects.bulk_create([TagStats(tag=tag, name=tag.name) for tag in missing], ignore_conflicts=True)
+
+    stats = TagStats.objects.filter(name__in=names)
+
+    changes = dict(total=total, answered=answered, commented=commented)
+    changes = {key: F(key) + value for key, value in changes.items() if value}
+    if changes:
+        stats.update(**changes)
+
+    if date:
+        stats.filter(Q(lastedit_date=None) | Q(lastedit_date__lt=date)).update(lastedit_date=date)
+
+
+def reconcile_votes(start, end):
+    """
+    Recomputes the exact vote counters for posts with primary keys in [start, end).
+    Returns the number of posts that were corrected.
+    """
+    from django.db.models import Count
+
+    # Votes on own posts are not counted.
+    votes = Vote.objects.exclude(author=F('post__author'))
+
+    # Counts for each post.
+    per_post = votes.filter(post__pk__gte=start, post__pk__lt=end).values('post_id')
+    per_post = per_post.annotate(total=Count('id'), books=Count('id', filter=Q(type=Vote.BOOKMARK)),
+                                 accepts=Count('id', filter=Q(type=Vote.ACCEPT)))
+    per_post = {row['post_id']: row for row in per_post}
+
+    # Counts for each thread, accepted answers are counted on the root as well.
+    per_thread = votes.filter(post__root__pk__gte=start, post__root__pk__lt=end).values('post__root_id')
+    accepted = Q(type=Vote.ACCEPT) & Q(post__is_toplevel=False)
+    per_thread = per_thread.annotate(total=Count('id'), accepts=Count('id', filter=accepted))
+    per_thread = {row['post__root_id']: row for row in per_thread}
+
+    fields = ['vote_count', 'book_count', 'accept_count', 'thread_votecount']
+    posts = Post.objects.filter(pk__gte=start, pk__lt=end).only('id', 'is_toplevel', *fields)
+
+    changed = []
+    for post in posts:
+        row = per_post.get(post.id, {})
+        thread = per_thread.get(post.id, {})
+
+        expected = dict(vote_count=row.get('total', 0), book_count=row.get('books', 0),
+                        accept_count=row.get('accepts', 0), thread_votecount=thread.get('total', 0))
+
+        if post.is_toplevel:
+            expected['accept_count'] = thread.get('accepts', 0)
+
+        if any(getattr(post, key) != value for key, value in expected.items()):
+            for key, value in expected.items():
+                setattr(post, key, value)
+            changed.append(post)
+
+    Post.objects.bulk_update(changed, fields=fields)
+
+    return len(changed)
+
+
 def move(request, parent, source, ptype=Post.COMMENT, msg="moved"):
     user = request.user
     url = source.get_absolute_url()
@@ -426,8 +564,11 @@ def move(request, parent, source, ptype=Post.COMMENT, msg="moved"):
     source.parent = parent
     source.type = ptype
 
+    # The move is an edit of the thread, the cached snapshots expire.
+    now = util.now()
     title = f"{source.get_type_display()}: {source.root.title[:80]}"
-    Post.objects.filter(uid=source.uid).update(parent=parent, type=ptype, title=title)
+    Post.objects.filter(uid=source.uid).update(parent=parent, type=ptype, title=title, lastedit_date=now)
+    Post.objects.filter(pk=source.root_id).update(lastedit_date=now)
 
     # Log action and let user know
     messages.info(request, mark_safe(msg))
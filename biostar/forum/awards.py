@@ -3,9 +3,8 @@ import logging
 from django.utils.timezone import utc
 from datetime import datetime, timedelta
 from django.db.models import Count
-from django.db.models import Q
-from biostar.accounts.models import User
-from biostar.forum.models import Post, Vote, Badge, Award
+from django.db.models.functions import Length
+from biostar.forum.models import Post, Badge
 
 logger = logging.getLogger("engine")
 
@@ -14,11 +13,6 @@ def now():
     return datetime.utcnow().replace(tzinfo=utc)
 
 
-def wrap_qs(cond, klass, pk):
-
-    return klass.objects.filter(pk=pk) if cond else klass.objects.none()
-
-
 class AwardDef(object):
     def __init__(self, name, desc, func, icon, max=None, type=Badge.BRONZE):
         self.name = name
@@ -31,31 +25,20 @@ class AwardDef(object):
         # No limit if left empty.
         self.max = max
 
-    def get_awards(self, user):
-
-        try:
-            value = self.fun(user).order_by("pk")
-
-            # Only return the ones that have one
-        except Exception as exc:
-            logger.error("validator error %s" % exc)
-            return []
-
-        if isinstance(value.first(), Post):
-            # Count awards user has for this post.
-            award_count = Count('award', filter=Q(author=user))
-
-            # Get posts/user combo that have not been awarded yet
-            value = value.annotate(award_count=award_count).filter(award_count=0)
-
-            return value
-
-        # Existing award user has won at this point.
-        awarded = Award.objects.filter(badge__name=self.name, user=user)
-
-        # Ensure users does not get over rewarded.
-        if self.max and len(awarded) >= self.max:
-            return []
+    def get_targets(self, users):
+        """
+        Evaluates the rule once over a queryset of users.
+        Returns (user_id, post_id, date) tuples, the post is None for user awards.
+        """
+        value = self.fun(users)
+
+        if value.model == Post:
+            # A post earns a single award.
+            value = value.filter(award=None)
+            value = list(value.values_list("author_id", "id", "lastedit_date"))
+        else:
+            value = value.values_list("id", "profile__last_login")
+            value = [(uid, None, date) for uid, date in value]
 
         return value
 
@@ -70,7 +53,7 @@ class AwardDef(object):
 AUTOBIO = AwardDef(
     name="Autobiographer",
     desc="has more than 80 characters in the information field of the user's profile",
-    func=lambda user: wrap_qs(len(user.profile.text) > 80 and user.profile.score > 1, User, user.id),
+    func=lambda users: users.annotate(text_len=Length("profile__text")).filter(text_len__gt=80, profile__score__gt=1),
     max=1,
     icon="bullhorn icon"
 )
@@ -78,7 +61,7 @@ AUTOBIO = AwardDef(
 GOOD_QUESTION = AwardDef(
     name="Good Question",
     desc="asked a question that was upvoted at least 5 times",
-    func=lambda user: Post.objects.filter(vote_count__gte=5, author=user, type=Post.QUESTION),
+    func=lambda users: Post.objects.filter(vote_count__gte=5, author__in=users, type=Post.QUESTION),
     max=1,
     icon="question circle icon"
 )
@@ -86,7 +69,7 @@ GOOD_QUESTION = AwardDef(
 GOOD_ANSWER = AwardDef(
     name="Good Answer",
     desc="created an answer that was upvoted at least 5 times",
-    func=lambda user: Post.objects.filter(vote_count__gt=5, author=user, type=Post.ANSWER),
+    func=lambda users: Post.objects.filter(vote_count__gt=5, author__in=users, type=Post.ANSWER),
     max=1,
     icon="book icon"
 )
@@ -94,7 +77,7 @@ GOOD_ANSWER = AwardDef(
 STUDENT = AwardDef(
     name="Student",
     desc="asked a question with at least 3 up-votes",
-    func=lambda user: Post.objects.filter(vote_count__gt=2, author=user, type=Post.QUESTION),
+    func=lambda users: Post.objects.filter(vote_count__gt=2, author__in=users, type=Post.QUESTION),
     max=1,
     icon="graduation cap icon"
 )
@@ -102,7 +85,7 @@ STUDENT = AwardDef(
 TEACHER = AwardDef(
     name="Teacher",
     desc="created an answer with at least 3 up-votes",
-    func=lambda user: Post.objects.filter(vote_count__gt=2, author=user, type=Post.ANSWER),
+    func=lambda users: Post.objects.filter(vote_count__gt=2, author__in=users, type=Post.ANSWER),
     max=1,
     icon="smile icon"
 )
@@ -110,7 +93,7 @@ TEACHER = AwardDef(
 COMMENTATOR = AwardDef(
     name="Commentator",
     desc="created a comment with at least 3 up-votes",
-    func=lambda user: Post.objects.filter(vote_count__gt=2, author=user, type=Post.COMMENT),
+    func=lambda users: Post.objects.filter(vote_count__gt=2, author__in=users, type=Post.COMMENT),
     max=1,
     icon="mycomment icon"
 )
@@ -118,7 +101,7 @@ COMMENTATOR = AwardDef(
 CENTURION = AwardDef(
     name="Centurion",
     desc="created 100 posts",
-    func=lambda user: wrap_qs(Post.objects.filter(author=user).count() > 100, User, user.id),
+    func=lambda users: users.annotate(post_count=Count("post")).filter(post_count__gt=100),
     max=1,
     icon="bolt icon",
     type=Badge.SILVER,
@@ -127,7 +110,7 @@ CENTURION = AwardDef(
 EPIC_QUESTION = AwardDef(
     name="Epic Question",
     desc="created a question with more than 10,000 views",
-    func=lambda user: Post.objects.filter(author=user, view_count__gt=10000),
+    func=lambda users: Post.objects.filter(author__in=users, view_count__gt=10000),
     max=1,
     icon="bullseye icon",
     type=Badge.GOLD,
@@ -136,7 +119,7 @@ EPIC_QUESTION = AwardDef(
 POPULAR = AwardDef(
     name="Popular Question",
     desc="created a question with more than 1,000 views",
-    func=lambda user: Post.objects.filter(author=user, view_count__gt=1000),
+    func=lambda users: Post.objects.filter(author__in=users, view_count__gt=1000),
     max=1,
     icon="eye icon",
     type=Badge.GOLD,
@@ -145,7 +128,7 @@ POPULAR = AwardDef(
 ORACLE = AwardDef(
     name="Oracle",
     desc="created more than 1,000 posts (questions + answers + comments)",
-    func=lambda user: wrap_qs(Post.objects.filter(author=user).count() > 1000, User, user.id),
+    func=lambda users: users.annotate(post_count=Count("post")).filter(post_count__gt=1000),
     max=1,
     icon="sun icon",
     type=Badge.GOLD,
@@ -154,7 +137,7 @@ ORACLE = AwardDef(
 PUNDIT = AwardDef(
     name="Pundit",
     desc="created a comment with more than 10 votes",
-    func=lambda user: Post.objects.filter(author=user, type=Post.COMMENT, vote_count__gt=10),
+    func=lambda users: Post.objects.filter(author__in=users, type=Post.COMMENT, vote_count__gt=10),
     max=1,
     icon="comments icon",
     type=Badge.SILVER,
@@ -163,7 +146,7 @@ PUNDIT = AwardDef(
 GURU = AwardDef(
     name="Guru",
     desc="received more than 100 upvotes",
-    func=lambda user: wrap_qs(Vote.objects.filter(post__author=user).count() > 100, User, user.id),
+    func=lambda users: users.annotate(vote_count=Count("post__votes")).filter(vote_count__gt=100),
     max=1,
     icon="beer icon",
     type=Badge.SILVER,
@@ -172,7 +155,7 @@ GURU = AwardDef(
 CYLON = AwardDef(
     name="Cylon",
     desc="received 1,000 up votes",
-    func=lambda user: wrap_qs(Vote.objects.filter(post__author=user).count() > 1000, User, user.id),
+    func=lambda users: users.annotate(vote_count=Count("post__votes")).filter(vote_count__gt=1000),
     max=1,
     icon="rocket icon",
     type=Badge.GOLD,
@@ -181,7 +164,7 @@ CYLON = AwardDef(
 VOTER = AwardDef(
     name="Voter",
     desc="voted more than 100 times",
-    func=lambda user: wrap_qs(Vote.objects.filter(author=user).count() > 100, User, user.id),
+    func=lambda users: users.annotate(vote_count=Count("vote")).filter(vote_count__gt=100),
     max=1,
     icon="thumbs up outline icon"
 )
@@ -189,7 +172,7 @@ VOTER = AwardDef(
 SUPPORTER = AwardDef(
     name="Supporter",
     desc="voted at least 25 times",
-    func=lambda user: wrap_qs(Vote.objects.filter(author=user).count() > 25, User, user.id),
+    func=lambda users: users.annotate(vote_count=Count("vote")).filter(vote_count__gt=25),
     max=1,
     icon="thumbs up icon",
     type=Badge.SILVER,
@@ -198,7 +181,7 @@ SUPPORTER = AwardDef(
 SCHOLAR = AwardDef(
     name="Scholar",
     desc="created an answer that has been accepted",
-    func=lambda user: Post.objects.filter(author=user, type=Post.ANSWER, accept_count__gt=0),
+    func=lambda users: Post.objects.filter(author__in=users, type=Post.ANSWER, accept_count__gt=0),
     max=1,
     icon="university icon"
 )
@@ -206,7 +189,7 @@ SCHOLAR = AwardDef(
 PROPHET = AwardDef(
     name="Prophet",
     desc="created a post with more than 20 followers",
-    func=lambda user: Post.objects.filter(author=user, type__in=Post.TOP_LEVEL, subs_count__gt=20),
+    func=lambda users: Post.objects.filter(author__in=users, type__in=Post.TOP_LEVEL, subs_count__gt=20),
     max=1,
     icon="leaf icon"
 )
@@ -214,17 +197,16 @@ PROPHET = AwardDef(
 LIBRARIAN = AwardDef(
     name="Librarian",
     desc="created a post with more than 10 bookmarks",
-    func=lambda user: Post.objects.filter(author=user, type__in=Post.TOP_LEVEL, book_count__gt=10),
+    func=lambda users: Post.objects.filter(author__in=users, type__in=Post.TOP_LEVEL, book_count__gt=10),
     max=1,
     icon="bookmark outline icon"
 )
 
 
-def rising_star(user):
+def rising_star(users):
     # The user joined no more than three months ago
-    cond = now() < user.profile.date_joined + timedelta(weeks=15)
-    cond = cond and Post.objects.filter(author=user).count() > 50
-    return wrap_qs(cond, User, user.id)
+    users = users.filter(profile__date_joined__gt=now() - timedelta(weeks=15))
+    return users.annotate(post_count=Count("post")).filter(post_count__gt=50)
 
 
 RISING_STAR = AwardDef(
@@ -240,7 +222,7 @@ RISING_STAR = AwardDef(
 GREAT_QUESTION = AwardDef(
     name="Great Question",
     desc="created a question with more than 5,000 views",
-    func=lambda user: Post.objects.filter(author=user, view_count__gt=5000),
+    func=lambda users: Post.objects.filter(author__in=users, view_count__gt=5000),
     icon="fire icon",
     type=Badge.SILVER,
 )
@@ -248,7 +230,7 @@ GREAT_QUESTION = AwardDef(
 GOLD_STANDARD = AwardDef(
     name="Gold Standard",
     desc="created a post with more than 25 bookmarks",
-    func=lambda user: Post.objects.filter(author=user, book_count__gt=25),
+    func=lambda users: Post.objects.filter(author__in=users, book_count__gt=25),
     icon="bookmark icon",
     type=Badge.GOLD,
 )
@@ -256,7 +238,7 @@ GOLD_STANDARD = AwardDef(
 APPRECIATED = AwardDef(
     name="Appreciated",
     desc="created a post with more than 5 votes",
-    func=lambda user: Post.objects.filter(author=user, vote_count__gt=5),
+    func=lambda users: Post.objects.filter(author__in=users, vote_count__gt=5),
     icon="heart icon",
     type=Badge.SILVER,
 )
@@ -23,12 +23,14 @@ ORDER_MAPPER = {
     ACTIVITY: '-profile__date_joined'
 }
 
-ALLOWED_PARAMS = {"page", "order", "type", "limit", "query", "user", "active"}
+# Cursors that point at the row before or after the current page.
+CURSOR_PARAMS = {"after", "before"}
+
+ALLOWED_PARAMS = {"page", "order", "type", "limit", "query", "user", "active"} | CURSOR_PARAMS
 
 # Cache keys used to cache objects.
 LATEST_CACHE_KEY = "LATEST"
 TAGS_CACHE_KEY = "TAGS"
-SIMILAR_CACHE_KEY = "similar"
 USERS_LIST_KEY = "USERS_LIST"
 
 # The name of the session count data.
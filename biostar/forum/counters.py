@@ -0,0 +1,107 @@
+"""
+Counters shown in the user menus, kept in the cache so that a session update needs no count queries.
+
+Writes increment global sequence numbers (spam, moderation logs, planet posts)
+and per-user counters (votes received). Each user stores the values seen at the
+previous session update, the counts are the difference since then.
+
+A per-process cache would not see the writes of the other workers, the spooler and the cron jobs.
+The counts are then queried from the database instead.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from biostar.planet.models import BlogPost
+from biostar.forum.models import Post, Vote, Log, shared_cache
+
+logger = logging.getLogger("engine")
+
+# The global sequences.
+SPAM, MODS, PLANET = "spam", "mod", "planet"
+
+# The per-user sequences.
+VOTES = "vote"
+
+GLOBAL = [SPAM, MODS, PLANET]
+
+
+def counter_key(name, user_id=None):
+    return f"counter-{name}-{user_id}" if user_id else f"counter-{name}"
+
+
+def marks_key(user_id):
+    return f"counter-marks-{user_id}"
+
+
+def incr(name, user_id=None, delta=1):
+    """
+    Advances a sequence, creating it when missing.
+    """
+    if delta <= 0 or not shared_cache():
+        return
+
+    key = counter_key(name, user_id)
+
+    # Only creates the key when it does not exist.
+    cache.add(key, 0, timeout=None)
+
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # The key was evicted between the two calls.
+        cache.set(key, delta, timeout=None)
+
+
+def query_counts(user):
+    """
+    Returns the counts since the last visit of the user from the database.
+    """
+    since = user.profile.last_login
+
+    # The number of new votes since last visit.
+    vote_count = Vote.objects.filter(post__author=user, date__gte=since).exclude(author=user)[:1000].count()
+
+    # Planet count since last visit
+    planet_count = BlogPost.objects.filter(rank__gte=since)[:100].count()
+
+    # Spam count since last visit.
+    spam_count = Post.objects.filter(spam=Post.SPAM, creation_date__gte=since)[:1000].count()
+
+    # Moderation actions since last visit.
+    mod_count = Log.objects.filter(date__gte=since)[:100].count()
+
+    counts = dict(mod_count=mod_count, spam_count=spam_count, planet_count=planet_count,
+                  vote_count=vote_count, message_count=user.profile.new_messages)
+
+    return counts
+
+
+def get_counts(user):
+    """
+    Returns the counts since the previous session update and moves the user marks forward.
+    """
+    if not shared_cache():
+        return query_counts(user)
+
+    keys = {name: counter_key(name) for name in GLOBAL}
+    keys[VOTES] = counter_key(VOTES, user.id)
+
+    found = cache.get_many(list(keys.values()) + [marks_key(user.id)])
+
+    current = {name: found.get(key, 0) for name, key in keys.items()}
+
+    # A user without marks starts from the current values.
+    marks = found.get(marks_key(user.id)) or current
+
+    # Sequences restart from zero when the cache is cleared.
+    counts = {name: max(value - marks.get(name, value), 0) for name, value in current.items()}
+
+    cache.set(marks_key(user.id), current, timeout=settings.COUNTER_MARKS_TIMEOUT)
+
+    # The unread messages are already counted in the profile.
+    counts = dict(mod_count=counts[MODS], spam_count=counts[SPAM], planet_count=counts[PLANET],
+                  vote_count=counts[VOTES], message_count=user.profile.new_messages)
+
+    return counts
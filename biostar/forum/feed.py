@@ -1,5 +1,11 @@
+import hashlib
 from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, quote_etag
 
 from biostar.forum.models import Post
 from biostar.forum.util import now, split
@@ -17,7 +23,6 @@ FEED_COUNT = 25
 
 HTML_THRESHOLD = 1500
 
-
 def reduce_html(text):
     if len(text) > HTML_THRESHOLD:
         text = bleach.clean(text, strip=True)
@@ -25,12 +30,51 @@ def reduce_html(text):
     return text
 
 
+def feed_version():
+    """
+    Changes when a post is published or edited, all cached feeds expire.
+    Both columns are indexed, every process computes the same version from the database.
+    """
+    found = Post.objects.aggregate(last=Max('id'), edited=Max('lastedit_date'))
+    return f"{found['last']}-{found['edited']}"
+
+
+def feed_key(request):
+    version = feed_version()
+    text = f"{version}-{request.get_full_path()}"
+    return f"feed-{hashlib.md5(text.encode('utf-8')).hexdigest()}"
+
+
 class PostBase(Feed):
     "Forms the base class to any feed producing posts"
     link = "/"
     title = "title"
     description = "description"
 
+    def __call__(self, request, *args, **kwargs):
+        """
+        Serves the feed from the cache and answers conditional requests with 304 responses.
+        """
+        key = feed_key(request)
+        found = cache.get(key)
+
+        if found is None:
+            response = super().__call__(request, *args, **kwargs)
+            etag = quote_etag(hashlib.md5(response.content).hexdigest())
+            found = dict(content=response.content, content_type=response['Content-Type'], etag=etag,
+                         modified=response.get('Last-Modified'))
+            cache.set(key, found, timeout=settings.FEED_CACHE_TIMEOUT)
+
+        response = HttpResponse(found['content'], content_type=found['content_type'])
+        response['ETag'] = found['etag']
+        if found['modified']:
+            response['Last-Modified'] = found['modified']
+
+        modified = parse_http_date_safe(found['modified']) if found['modified'] else None
+
+        # Returns a 304 response when the client already has this content.
+        return get_conditional_response(request, etag=found['etag'], last_modified=modified, response=response)
+
     def item_title(self, item):
         return item.title
 
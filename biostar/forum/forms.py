@@ -11,7 +11,7 @@ from snowpenguin.django.recaptcha2.fields import ReCaptchaField
 from snowpenguin.django.recaptcha2.widgets import ReCaptchaWidget
 from biostar.accounts.models import User
 from .models import Post
-from biostar.forum import models, auth
+from biostar.forum import models, auth, util
 
 from .const import *
 
@@ -151,6 +151,7 @@ class PostLongForm(forms.Form):
         self.post.type = data.get('post_type')
         self.post.tag_val = data.get('tag_val')
         self.post.lastedit_user = self.user
+        self.post.lastedit_date = util.now()
         self.post.save()
         return self.post
 
@@ -1,15 +1,57 @@
 from datetime import timedelta
 import logging
+import textwrap
+import time
+from django.conf import settings
 from django.template import loader
 from django.core.management.base import BaseCommand
 from taggit.models import Tag
 from biostar.forum.models import Post
-from biostar.emailer.tasks import send_email
+from biostar.emailer import sender
+from biostar.emailer.tasks import base_context
 from biostar.accounts import util, models
 
 logger = logging.getLogger('engine')
 
 
+# Total number of recipients allowed per batch,
+# AWS has limit of 50
+BATCH_SIZE = 40
+
+# Attempts to send a batch before giving up on it.
+RETRIES = 3
+
+
+def render_digest(posts, subject):
+    """
+    Renders the digest once, the same email goes to every recipient.
+    """
+    email = sender.EmailTemplate("messages/digest.html")
+    context = base_context(subject=subject)
+    context.update(posts=posts)
+    subject, text, html = email.render(context)
+
+    # Text may be indented in template.
+    text = textwrap.dedent(text)
+    html = html if len(html) > 10 else ''
+
+    return subject, text, html
+
+
+def recipient_batches(emails, size):
+    """
+    Groups the recipients into batches without loading all of them at once.
+    """
+    batch = []
+    for email in emails.iterator():
+        batch.append(email)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def send_digests(days=1, subject=""):
     '''
     Send digest emails to users
@@ -24,28 +66,36 @@ def send_digests(days=1, subject=""):
 
     posts = Post.objects.filter(lastedit_date__gt=trange, is_toplevel=True).order_by('-lastedit_date')
 
+    # Evaluate the posts a single time.
+    posts = list(posts)
+
     if not posts:
         logger.info(f'No new posts found in the last {days} days.')
         return
 
-    # Total number of recipients allowed per batch,
-    # AWS has limit of 50
-    batch_size = 40
+    if not settings.SEND_MAIL or settings.DATA_MIGRATION:
+        return
+
+    subject, text, html = render_digest(posts=posts, subject=subject)
 
     # Get users with the appropriate digest preference.
     pref = mapper.get(days, models.Profile.DAILY_DIGEST)
-    context = dict(subject=subject, posts=posts)
     users = models.User.objects.filter(profile__digest_prefs=pref)
     emails = users.values_list('email', flat=True)
 
-    # Iterate through recipients and send emails in batches.
-    for idx in range(0, len(emails), batch_size):
-        # Get the next set of emails
-        end = idx + batch_size
-        rec_list = emails[idx:end]
-        send_email(template_name="messages/digest.html", extra_context=context, recipient_list=rec_list)
+    from_email = settings.FROM_EMAIL_PATTERN % ("", settings.DEFAULT_FROM_EMAIL)
+    batches = recipient_batches(emails, size=BATCH_SIZE)
+
+    # All batches go over the same connection.
+    start = time.time()
+    sent, failed = sender.send_batches(subject=subject, message=text, message_html=html, from_email=from_email,
+                                       batches=batches, retries=RETRIES)
+    elapsed = max(time.time() - start, 0.001)
+
+    logger.info(f"digest sent to {sent} recipients in {elapsed:.1f}s ({sent / elapsed:.1f} recipients/s), "
+                f"failed batches={failed}")
 
-    return
+    return sent
 
 
 class Command(BaseCommand):
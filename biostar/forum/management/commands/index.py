@@ -1,7 +1,7 @@
 
 import logging
 from typing import Any
-import os, sys
+import os, sys, time
 from django.core.management.base import BaseCommand
 from biostar.forum.models import Post
 from django.conf import settings
@@ -36,19 +36,37 @@ def build(size, remove=False):
 
     logger.info(f"Indexed {target_count} posts, {count} unindexed posts remaining")
 
-    # Take spam posts that have been indexed and remove.
-    spam_posts = Post.objects.filter(spam=Post.SPAM, indexed=False)[:size]
-    sids = [post.id for post in spam_posts]
 
-    for post in spam_posts:
-        # Remove spam from search index.
-        search.remove_post(post=post)
+@check_lock(LOCK)
+def rebuild(workers):
+    """
+    Rebuilds the whole search index using multiple processes.
+    """
+    total = search.rebuild_index(workers=workers)
+    logger.info(f"Rebuilt the index with {total} posts using {workers} workers")
+
+
+@check_lock(LOCK)
+def drain(size, follow=False, interval=None):
+    """
+    Applies the pending updates in the index queue.
+    Keeps the index open and polls the queue when following.
+    """
+    interval = interval or settings.INDEX_QUEUE_INTERVAL
+    ix = search.init_index()
+
+    while True:
+        processed = search.drain_queue(limit=size, ix=ix)
 
-    # Update the spam indexed flag.
-    Post.objects.filter(id__in=sids).update(indexed=True)
+        if processed:
+            logger.info(f"Processed {processed} index queue entries")
 
-    # Add to spam index
-    logger.info(f"Removed {len(sids)} spam posts from index")
+        if not follow:
+            break
+
+        # Wait only when the queue has been emptied.
+        if processed < size:
+            time.sleep(interval)
 
 
 class Command(BaseCommand):
@@ -60,6 +78,12 @@ class Command(BaseCommand):
         parser.add_argument('--remove', action='store_true', default=False, help="Removes the existing index.")
         parser.add_argument('--report', action='store_true', default=False, help="Reports on the content of the index.")
         parser.add_argument('--size', type=int, default=0, help="How many posts to index")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Rebuilds the whole index using this many processes.")
+        parser.add_argument('--drain', action='store_true', default=False, help="Applies the pending index queue.")
+        parser.add_argument('--follow', action='store_true', default=False,
+                            help="Keeps draining the index queue as new entries arrive.")
+        parser.add_argument('--interval', type=int, default=0, help="Seconds to wait between queue checks.")
 
     def handle(self, *args, **options):
 
@@ -69,16 +93,28 @@ class Command(BaseCommand):
         remove = options['remove']
         report = options['report']
         size = options['size']
+        follow = options['follow']
+        drain_queue = options['drain'] or follow
+        interval = options['interval']
+        workers = options['workers']
 
         # Sets the un-indexed flags to false on all posts.
         if reset:
             logger.info(f"Setting indexed field to false on all post.")
             Post.objects.valid_posts(indexed=True).exclude(root=None).update(indexed=False)
 
+        # Rebuild the entire index in parallel.
+        if workers:
+            rebuild(workers=workers)
+
         # Index a limited number yet unindexed posts
-        if size:
+        if size and not drain_queue and not workers:
             build(size=size, remove=remove)
 
+        # Apply the updates queued by post changes.
+        if drain_queue:
+            drain(size=size or settings.BATCH_INDEXING_SIZE, follow=follow, interval=interval)
+
         # Report the contents of the index
         if report:
             search.print_info()
@@ -0,0 +1,34 @@
+import logging
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from biostar.forum import markdown
+
+logger = logging.getLogger('engine')
+
+
+class Command(BaseCommand):
+    help = 'Renders the html of all posts again, for example after the sanitization rules change.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="How many processes render the posts.")
+        parser.add_argument('--chunk', type=int, default=1000, help="How many posts are rendered in one step.")
+        parser.add_argument('--start', type=int, default=0, help="The primary key to start from.")
+        parser.add_argument('--resume', action='store_true', default=False, help="Start from the last checkpoint.")
+        parser.add_argument('--checkpoint', default=settings.RENDER_CHECKPOINT, help="The checkpoint file.")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        chunk = options['chunk']
+        start = options['start']
+        checkpoint = options['checkpoint']
+
+        # Continue after the last chunk that was written.
+        if options['resume'] and os.path.isfile(checkpoint):
+            with open(checkpoint, "rt") as fp:
+                start = int(fp.read().strip() or 0)
+            logger.info(f"resuming from pk={start}")
+
+        total, changed = markdown.rerender(workers=workers, chunk=chunk, start=start, checkpoint=checkpoint)
+
+        logger.info(f"rendered {total} posts, updated {changed}")
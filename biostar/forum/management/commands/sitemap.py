@@ -1,8 +1,11 @@
 """
 Creates a sitemap in the EXPORT directory
 """
+import gzip
+import json
 import os
 from django.conf import settings
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max
 from django.contrib.sitemaps import GenericSitemap
 from django.contrib.sites.models import Site
 from biostar.forum.models import Post
@@ -41,6 +44,16 @@ SITEMAP_ROW = """
     </sitemap>
 """
 
+SHARD_ROW = """
+    <sitemap>
+        <loc>https://%s%s%s</loc>
+        <lastmod>%s</lastmod>
+    </sitemap>
+"""
+
+# Keeps the signature of each written shard.
+STATE_FILE = "sitemap.json"
+
 
 def ping_google():
     try:
@@ -81,15 +94,132 @@ def generate_sitemap(index, batch):
         print(URLSET_END, end='')
 
 
+def sitemap_posts():
+    """
+    The posts listed in the sitemap.
+    """
+    posts = Post.objects.filter(is_toplevel=True, root__status=Post.OPEN).exclude(type=Post.BLOG)
+    return posts
+
+
+def shard_name(shard):
+    return f"sitemap_{shard}.xml.gz"
+
+
+def shard_signatures(size):
+    """
+    Returns the post count and latest edit date for every shard, in a single query.
+    """
+    shard = ExpressionWrapper(F('pk') / size, output_field=IntegerField())
+    rows = sitemap_posts().annotate(shard=shard).values('shard').annotate(count=Count('pk'), lastmod=Max('lastedit_date'))
+    rows = rows.order_by('shard')
+
+    signatures = {row['shard']: [row['count'], row['lastmod'].isoformat()] for row in rows}
+
+    return signatures
+
+
+def stream_posts(start, end, chunk=5000):
+    """
+    Yields the posts with start <= pk < end, following the primary key instead of an offset.
+    """
+    posts = sitemap_posts().order_by("pk").only("pk", "uid", "lastedit_date")
+    last = start - 1
+    while True:
+        batch = list(posts.filter(pk__gt=last, pk__lt=end)[:chunk])
+        yield from batch
+        if len(batch) < chunk:
+            break
+        last = batch[-1].pk
+
+
+def write_atomic(path, content):
+    """
+    Writes into a temporary file that replaces the target, readers never see a partial file.
+    """
+    temp = f"{path}.tmp"
+    with open(temp, 'wt', encoding="utf-8") as stream:
+        stream.write(content)
+    os.replace(temp, path)
+
+
+def write_shard(path, shard, size, domain):
+    """
+    Writes the compressed sitemap of one shard, also through a temporary file.
+    """
+    temp = f"{path}.tmp"
+    with gzip.open(temp, 'wt', encoding="utf-8") as stream:
+        stream.write(URLSET_START)
+        for post in stream_posts(start=shard * size, end=(shard + 1) * size):
+            lastmod = post.lastedit_date.strftime("%Y-%m-%d")
+            stream.write(URLSET_ROW % (domain, post.uid, lastmod))
+        stream.write(URLSET_END)
+    os.replace(temp, path)
+
+
+def build_sitemap(outdir, size, full=False):
+    """
+    Writes the compressed sitemap files and the index into outdir.
+    Only the shards with added, removed or edited posts since the previous run are written again.
+    Returns the number of shards that were written.
+    """
+    site = Site.objects.get_current()
+
+    os.makedirs(outdir, exist_ok=True)
+    state_path = os.path.join(outdir, STATE_FILE)
+
+    # The signatures of the previous run.
+    old = {}
+    if not full and os.path.isfile(state_path):
+        state = json.load(open(state_path))
+        # A different shard width invalidates every file.
+        old = state['shards'] if state.get('size') == size else {}
+
+    # Json keys are strings.
+    old = {int(key): value for key, value in old.items()}
+
+    new = shard_signatures(size=size)
+
+    # Shards that changed since the previous run.
+    changed = [shard for shard, sig in new.items() if old.get(shard) != sig]
+
+    for shard in changed:
+        write_shard(path=os.path.join(outdir, shard_name(shard)), shard=shard, size=size, domain=site.domain)
+
+    # Shards without posts are removed.
+    for shard in set(old) - set(new):
+        path = os.path.join(outdir, shard_name(shard))
+        if os.path.isfile(path):
+            os.remove(path)
+
+    # The index is small, it is always written.
+    rows = [SHARD_ROW % (site.domain, settings.SITEMAP_URL, shard_name(shard), sig[1][:10]) for shard, sig in new.items()]
+    write_atomic(os.path.join(outdir, "sitemap.xml"), SITEMAP_XML % "".join(rows))
+
+    write_atomic(state_path, json.dumps(dict(size=size, shards=new)))
+
+    logger.info(f"sitemap shards={len(new)} written={len(changed)} in {outdir}")
+
+    return len(changed)
+
+
 class Command(BaseCommand):
     help = 'Creates a sitemap in the export folder of the site'
 
     def add_arguments(self, parser):
         parser.add_argument('--index', default=0, help="Writes an index")
         parser.add_argument('--batch', default=0, help="50K URL in a batch")
+        parser.add_argument('--outdir', default=settings.SITEMAP_DIR, help="Writes the compressed sitemap here")
+        parser.add_argument('--full', action='store_true', default=False, help="Writes every shard again")
 
     def handle(self, *args, **options):
         index = int(options['index'])
         batch = int(options['batch'])
-        generate_sitemap(index=index, batch=batch)
+
+        # Printing a single batch or the index to the standard output.
+        if index or batch:
+            generate_sitemap(index=index, batch=batch)
+            return
+
+        build_sitemap(outdir=options['outdir'], size=settings.SITEMAP_SHARD_SIZE, full=options['full'])
         # ping_google()
@@ -17,8 +17,8 @@ logger = logging.getLogger('engine')
 
 BACKUP_DIR = os.path.join(settings.BASE_DIR, 'export', 'backup')
 
-BUMP, UNBUMP, AWARD = 'bump', 'unbump', 'award'
-CHOICES = [BUMP, UNBUMP, AWARD]
+BUMP, UNBUMP, AWARD, SIMILAR, VOTES, VIEWS, TAGS, STATS = 'bump', 'unbump', 'award', 'similar', 'votes', 'views', 'tags', 'stats'
+CHOICES = [BUMP, UNBUMP, AWARD, SIMILAR, VOTES, VIEWS, TAGS, STATS]
 
 
 def bump(uids, **kwargs):
@@ -77,6 +77,56 @@ def awards(limit=50, **kwargs):
     return
 
 
+def similar(limit=1000, **kwargs):
+    """
+    Compute similar posts for new and changed threads.
+    """
+
+    tasks.batch_similar_posts(limit=limit)
+
+    return
+
+
+def votes(limit=5000, **kwargs):
+    """
+    Recompute the vote counters from the votes.
+    """
+
+    tasks.batch_reconcile_votes(limit=limit)
+
+    return
+
+
+def views(limit=1000, **kwargs):
+    """
+    Store the post views buffered in the cache.
+    """
+
+    count = models.flush_post_views(size=limit)
+    logger.info(f"stored {count} post views")
+
+    return
+
+
+def tags(limit=1000, **kwargs):
+    """
+    Recount the tag statistics from the posts.
+    """
+
+    tasks.batch_reconcile_tags(limit=limit)
+
+    return
+
+
+def stats(**kwargs):
+    """
+    Add the daily statistics up to yesterday, the first run fills in all days.
+    """
+
+    tasks.batch_daily_stats()
+
+    return
+
 
 class Command(BaseCommand):
     help = 'Preform action on list of posts.'
@@ -89,7 +139,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         action = options['action']
 
-        opts = {BUMP: bump, UNBUMP: unbump, AWARD: awards}
+        opts = {BUMP: bump, UNBUMP: unbump, AWARD: awards, SIMILAR: similar, VOTES: votes, VIEWS: views, TAGS: tags, STATS: stats}
 
         func = opts[action]
         # print()
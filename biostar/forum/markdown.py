@@ -2,12 +2,18 @@
 Markdown parser to render the Biostar style markdown.
 """
 import re
+import time
+import hashlib
+import threading
+import multiprocessing
 import inspect, logging
+from collections import OrderedDict
 from functools import partial
 import mistune
 import requests
 from xml.sax.saxutils import unescape
 from django.shortcuts import reverse
+from django.db import connections
 from django.db.models import F
 import bleach
 from bleach.linkifier import Linker
@@ -24,6 +30,16 @@ from bleach.callbacks import nofollow
 
 logger = logging.getLogger('engine')
 
+# Change this when the rendering rules change to invalidate the cached html.
+PARSER_VERSION = 1
+
+# Rendered html keyed by a hash of the input, least recently used first.
+HTML_CACHE = OrderedDict()
+HTML_LOCK = threading.Lock()
+
+# Compiled parsers, one per thread and set of options.
+PARSERS = threading.local()
+
 # Test input.
 TEST_INPUT = '''
 
@@ -388,6 +404,58 @@ def linkify(text):
     return html
 
 
+def get_parser(escape, allow_rewrite):
+    """
+    Returns the compiled parser for the current thread, created on first use.
+    """
+    parsers = PARSERS.__dict__.setdefault("parsers", {})
+    key = (escape, allow_rewrite)
+
+    if key not in parsers:
+        # Initialize the renderer
+        renderer = BiostarRenderer(escape=escape)
+
+        # Initialize the lexer
+        inline = BiostarInlineLexer(renderer=renderer, allow_rewrite=allow_rewrite)
+
+        parsers[key] = mistune.Markdown(hard_wrap=True, renderer=renderer, inline=inline)
+
+    return parsers[key]
+
+
+def drop_parser(escape, allow_rewrite):
+    parsers = PARSERS.__dict__.setdefault("parsers", {})
+    parsers.pop((escape, allow_rewrite), None)
+
+
+def cache_key(text, root=None, **opts):
+    """
+    Hash of the text, the root and the options used to render it.
+    """
+    uid = root.uid if root else ''
+    opts = ",".join(f"{k}={v}" for k, v in sorted(opts.items()))
+    value = f"{PARSER_VERSION}-{uid}-{opts}-{text}"
+    return hashlib.md5(value.encode("utf-8", errors="replace")).hexdigest()
+
+
+def get_html(key):
+    with HTML_LOCK:
+        html = HTML_CACHE.get(key)
+        if html is not None:
+            HTML_CACHE.move_to_end(key)
+    return html
+
+
+def set_html(key, html):
+    with HTML_LOCK:
+        HTML_CACHE[key] = html
+        HTML_CACHE.move_to_end(key)
+
+        # Drop the least recently used entries.
+        while len(HTML_CACHE) > settings.MARKDOWN_CACHE_SIZE:
+            HTML_CACHE.popitem(last=False)
+
+
 def safe(f):
     """
     Safely call an object without causing errors
@@ -419,15 +487,22 @@ def parse(text, post=None, clean=True, escape=True, allow_rewrite=False):
     # Resolve the root if exists.
     root = post.parent.root if (post and post.parent) else None
 
-    # Initialize the renderer
-    renderer = BiostarRenderer(escape=escape)
+    # Return the html rendered earlier for the same input.
+    key = cache_key(text, root=root, clean=clean, escape=escape, allow_rewrite=allow_rewrite)
+    output = get_html(key)
+    if output is not None:
+        return output
 
-    # Initialize the lexer
-    inline = BiostarInlineLexer(renderer=renderer, root=root, allow_rewrite=allow_rewrite)
+    markdown = get_parser(escape=escape, allow_rewrite=allow_rewrite)
+    markdown.inline.root = root
 
-    markdown = mistune.Markdown(hard_wrap=True, renderer=renderer, inline=inline)
+    try:
+        output = markdown(text=text)
+    except Exception:
+        # Do not reuse a parser left in an unknown state.
+        drop_parser(escape=escape, allow_rewrite=allow_rewrite)
+        raise
 
-    output = markdown(text=text)
     # Bleach clean the html.
     if clean:
         output = bleach.clean(text=output,
@@ -438,9 +513,73 @@ def parse(text, post=None, clean=True, escape=True, allow_rewrite=False):
     # Embed sensitive links into html
     output = linkify(text=output)
 
+    set_html(key, output)
+
     return output
 
 
+def render_range(start, end):
+    """
+    Renders the posts with primary keys in [start, end) and stores the html that changed.
+    Only the html column is written, no signals are sent.
+    """
+    posts = Post.objects.filter(pk__gte=start, pk__lt=end).only("id", "content", "html")
+
+    total, changed = 0, []
+    for post in posts.iterator():
+        total += 1
+        # Rendering without the post does not subscribe the mentioned users again.
+        html = parse(post.content, clean=True, escape=False)
+        if html != post.html:
+            post.html = html
+            changed.append(post)
+
+    Post.objects.bulk_update(changed, ["html"])
+
+    return end, total, len(changed)
+
+
+def render_job(job):
+    return render_range(*job)
+
+
+def rerender(workers=1, chunk=1000, start=0, checkpoint=None):
+    """
+    Renders the html of all posts starting at a primary key, in chunks spread over worker processes.
+    The end of every finished chunk is written into the checkpoint file.
+    """
+    ids = Post.objects.filter(pk__gte=start).order_by("pk").values_list("pk", flat=True)
+    ids = list(ids)
+    ranges = [(ids[i], ids[min(i + chunk, len(ids)) - 1] + 1) for i in range(0, len(ids), chunk)]
+
+    begin = time.time()
+    total = changed = 0
+
+    def results():
+        if workers > 1 and len(ranges) > 1:
+            # Forked workers must open their own database connections.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(processes=workers) as pool:
+                # Results come back in order, the checkpoint only moves forward.
+                yield from pool.imap(render_job, ranges)
+        else:
+            yield from map(render_job, ranges)
+
+    for end, count, updated in results():
+        total += count
+        changed += updated
+
+        if checkpoint:
+            with open(checkpoint, "wt") as fp:
+                fp.write(str(end))
+
+        rate = total / max(time.time() - begin, 0.001)
+        logger.info(f"rendered {total}/{len(ids)} posts, {changed} changed, {rate:.0f} posts/s")
+
+    return total, changed
+
+
 def test():
     html = parse(TEST_INPUT2)
     return html
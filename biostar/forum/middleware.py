@@ -12,7 +12,7 @@ from biostar.accounts.tasks import detect_location
 
 from biostar.utils import helpers
 
-from . import auth, tasks, const, util
+from . import auth, const, counters, util
 from .models import Vote
 from .util import now
 
@@ -99,14 +99,11 @@ def user_tasks(get_response):
             Profile.objects.filter(user=user).update(last_login=now())
 
             # Compute latest counts.
-            counts = auth.get_counts(user=user)
+            counts = counters.get_counts(user=user)
 
             # Set the session.
             request.session[settings.SESSION_COUNT_KEY] = counts
 
-            # Trigger award generation.
-            tasks.create_user_awards.spool(user_id=user.id)
-
         # Can process response here after its been handled by the view
         response = get_response(request)
 
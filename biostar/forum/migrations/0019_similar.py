@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0018_index_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Similar',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.TextField(default='[]')),
+                ('date', models.DateTimeField(db_index=True)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='forum.post')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taggit', '0004_alter_taggeditem_content_type_alter_taggeditem_tag'),
+        ('forum', '0019_similar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('total', models.IntegerField(db_index=True, default=0)),
+                ('answered', models.IntegerField(default=0)),
+                ('commented', models.IntegerField(default=0)),
+                ('lastedit_date', models.DateTimeField(null=True)),
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='taggit.tag')),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0020_tag_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_posts', models.IntegerField(default=0)),
+                ('new_users', models.IntegerField(default=0)),
+                ('new_votes', models.IntegerField(default=0)),
+                ('questions', models.IntegerField(default=0)),
+                ('answers', models.IntegerField(default=0)),
+                ('toplevel', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('votes', models.IntegerField(default=0)),
+                ('users', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
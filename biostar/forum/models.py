@@ -1,3 +1,4 @@
+import json
 import logging
 from datetime import timedelta
 from django.conf import settings
@@ -10,6 +11,7 @@ from django.db.models import F
 from django.db.models import Q
 from django.shortcuts import reverse
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 
 from biostar.utils import helpers
 from biostar.accounts.models import Profile
@@ -66,15 +68,23 @@ def delete_fragment_cache(key, *params):
     cache.delete(key)
 
 
+def thread_cache_key(uid, moderator):
+    """
+    Cache key of the thread snapshot, moderators see a different thread.
+    """
+    return f"thread-{uid}-{bool(moderator)}"
+
+
 def delete_post_cache(post):
     """
-    Drops both post specific template fragment caches.
+    Drops both post specific template fragment caches and the thread snapshot.
     """
     delete_fragment_cache("post", True, post.uid)
     delete_fragment_cache("post", False, post.uid)
     if post.root:
         delete_fragment_cache("post", True, post.root.uid)
         delete_fragment_cache("post", False, post.root.uid)
+        cache.delete_many([thread_cache_key(post.root.uid, True), thread_cache_key(post.root.uid, False)])
 
 
 class Post(models.Model):
@@ -418,9 +428,29 @@ class PostView(models.Model):
     date = models.DateTimeField(auto_now_add=True)
 
 
+# Cache keys holding the sequence of buffered post views.
+VIEW_SEQ_KEY = "post-views-seq"
+VIEW_DONE_KEY = "post-views-done"
+VIEW_MARK_KEY = "post-views-mark"
+
+
+def view_key(index):
+    return f"post-views-{index}"
+
+
+def shared_cache():
+    """
+    True when the cache is shared between processes.
+    A per-process cache would keep the buffered views from the process that stores them.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    return not backend.endswith(("LocMemCache", "DummyCache"))
+
+
 def update_post_views(post, request, timeout=settings.POST_VIEW_TIMEOUT):
     """
     Views are updated per interval.
+    With a shared cache the view is buffered and stored later by flush_post_views.
     """
 
     # Get the ip.
@@ -430,25 +460,181 @@ def update_post_views(post, request, timeout=settings.POST_VIEW_TIMEOUT):
     cache_key = f"{ip}-{post.id}"
 
     # Found hit no need to increment the views
-    if cache.get(cache_key):
+    if not cache.add(cache_key, 1, timeout):
         return
 
-    # Insert a new view into database.
-    PostView.objects.create(ip=ip, post=post)
+    if not shared_cache():
+        # Insert a new view into database.
+        PostView.objects.create(ip=ip, post=post)
+
+        # Separately increment post view.
+        Post.objects.filter(id=post.id).update(view_count=F('view_count') + 1)
 
-    # Separately increment post view.
-    Post.objects.filter(id=post.id).update(view_count=F('view_count') + 1)
+        # Drop the post related cache for logged in users.
+        if request.user.is_authenticated:
+            delete_post_cache(post)
 
-    # Set the cache.
-    cache.set(cache_key, 1, timeout)
+        return post
 
-    # Drop the post related cache for logged in users.
-    if request.user.is_authenticated:
-        delete_post_cache(post)
+    # Append the view to the buffer.
+    try:
+        cache.add(VIEW_SEQ_KEY, 0, None)
+        index = cache.incr(VIEW_SEQ_KEY)
+    except ValueError as exc:
+        # The sequence was evicted between the two calls.
+        logger.warning(f"post view not buffered: {exc}")
+        return
+
+    cache.set(view_key(index), (post.id, ip), settings.POST_VIEW_BUFFER_TIMEOUT)
 
     return post
 
 
+def flush_post_views(size=1000):
+    """
+    Stores the buffered post views and increments the view counts.
+    Returns the number of views stored.
+
+    A view takes its place in the sequence before its entry is written. Entries missing at a flush
+    are looked for again at the next one, and given up only when they are still missing then.
+    """
+    last = cache.get(VIEW_SEQ_KEY) or 0
+    done = cache.get(VIEW_DONE_KEY) or 0
+
+    # The end of the sequence at the previous flush.
+    mark = cache.get(VIEW_MARK_KEY) or 0
+
+    # The sequence starts over when the cache is cleared.
+    if done > last:
+        done = mark = 0
+
+    total = 0
+    pending = None
+    for start in range(done + 1, last + 1, size):
+        end = min(start + size, last + 1)
+        found = cache.get_many([view_key(index) for index in range(start, end)])
+
+        # The first entry that may still be written.
+        missing = [index for index in range(start, end) if index > mark and view_key(index) not in found]
+        if missing and pending is None:
+            pending = missing[0]
+
+        hits = found.values()
+
+        # Posts may have been deleted since the view.
+        valid = set(Post.objects.filter(id__in={pid for pid, ip in hits}).values_list('id', flat=True))
+        views = [PostView(post_id=pid, ip=ip) for pid, ip in hits if pid in valid]
+        PostView.objects.bulk_create(views)
+
+        # Posts with the same number of new views are updated together.
+        counts = dict()
+        for view in views:
+            counts[view.post_id] = counts.get(view.post_id, 0) + 1
+
+        deltas = dict()
+        for pid, value in counts.items():
+            deltas.setdefault(value, []).append(pid)
+
+        for value, pids in deltas.items():
+            Post.objects.filter(id__in=pids).update(view_count=F('view_count') + value)
+
+        # Only the entries that were read are removed.
+        cache.delete_many(list(found))
+        total += len(views)
+
+    # The next flush starts at the first entry that was not written yet.
+    done = last if pending is None else pending - 1
+    cache.set_many({VIEW_DONE_KEY: done, VIEW_MARK_KEY: last}, None)
+
+    return total
+
+
+class Similar(models.Model):
+    """
+    Posts similar to a top level post, computed in batches from the search index.
+    """
+    post = models.OneToOneField(Post, related_name="similar", on_delete=models.CASCADE)
+
+    # JSON list of the similar posts, each with uid, title and content.
+    data = models.TextField(default='[]')
+
+    # Date the similar posts were computed.
+    date = models.DateTimeField(db_index=True)
+
+    @property
+    def hits(self):
+        return json.loads(self.data)
+
+
+class TagStats(models.Model):
+    """
+    Top level post counts for a tag, updated by the post signals and reconciled in batches.
+    """
+    tag = models.OneToOneField(Tag, related_name="stats", on_delete=models.CASCADE)
+
+    # Copy of the tag name, allows lookups without a join.
+    name = models.CharField(max_length=100, db_index=True)
+
+    # Number of top level posts with this tag.
+    total = models.IntegerField(default=0, db_index=True)
+
+    # Number of top level posts with answers or comments.
+    answered = models.IntegerField(default=0)
+    commented = models.IntegerField(default=0)
+
+    # The last edit date of the top level posts.
+    lastedit_date = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.name
+
+
+class DailyStats(models.Model):
+    """
+    Site statistics for a day, the counts for that day and the totals at its end.
+    """
+    date = models.DateField(unique=True)
+
+    # Objects created on the day.
+    new_posts = models.IntegerField(default=0)
+    new_users = models.IntegerField(default=0)
+    new_votes = models.IntegerField(default=0)
+
+    # Totals at the end of the day.
+    questions = models.IntegerField(default=0)
+    answers = models.IntegerField(default=0)
+    toplevel = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    votes = models.IntegerField(default=0)
+    users = models.IntegerField(default=0)
+
+    TOTALS = ['questions', 'answers', 'toplevel', 'comments', 'votes', 'users']
+
+    def as_dict(self):
+        data = {key: getattr(self, key) for key in self.TOTALS}
+        data.update(new_post_count=self.new_posts, new_user_count=self.new_users, new_vote_count=self.new_votes)
+        data.update(date=util.datetime_to_iso(self.date), timestamp=util.datetime_to_unix(self.date))
+        return data
+
+
+class IndexQueue(models.Model):
+    """
+    Journal of posts whose search index entry needs to be refreshed.
+    """
+    # The uid is kept instead of a foreign key so deletions survive the post.
+    uid = models.CharField(max_length=32, db_index=True)
+    date = models.DateTimeField(auto_now_add=True)
+
+
+def queue_index(*uids):
+    """
+    Adds posts to the search index queue.
+    The indexer decides whether each post is updated or removed.
+    """
+    entries = [IndexQueue(uid=uid) for uid in uids if uid]
+    IndexQueue.objects.bulk_create(entries)
+
+
 class Subscription(models.Model):
     "Connects a post to a user"
 
@@ -16,8 +16,8 @@ from django.conf import settings
 from biostar.accounts.views import user_moderate as account_moderate
 from biostar.accounts.models import Profile, User
 from biostar.utils.decorators import check_params
-from biostar.forum.models import Post, delete_post_cache, Log
-from biostar.forum import auth, const, util
+from biostar.forum.models import Post, delete_post_cache, Log, queue_index
+from biostar.forum import auth, const, counters, util
 
 
 logger = logging.getLogger('engine')
@@ -175,6 +175,7 @@ def delete_post(request, post, **kwargs):
         url = "/" if post.is_toplevel else post.root.get_absolute_url()
     else:
         Post.objects.filter(uid=post.uid).update(status=Post.DELETED)
+        queue_index(post.uid)
         post.recompute_scores()
         msg = f"deleted post"
         messages.info(request, mark_safe(msg))
@@ -194,6 +195,7 @@ def open(request, post, **kwargs):
 
     user = request.user
     Post.objects.filter(uid=post.uid).update(status=Post.OPEN, spam=Post.NOT_SPAM)
+    queue_index(post.uid)
     post.recompute_scores()
 
     post.root.recompute_scores()
@@ -269,6 +271,10 @@ def toggle_spam(request, post, **kwargs):
         Post.objects.filter(id=post.id).update(spam=Post.NOT_SPAM, status=Post.OPEN)
     else:
         Post.objects.filter(id=post.id).update(spam=Post.SPAM, status=Post.CLOSED)
+        counters.incr(counters.SPAM)
+
+    # Update or remove the post from the search index.
+    queue_index(post.uid)
 
     # Refetch up to date state of the post.
     post = Post.objects.filter(id=post.id).get()
@@ -285,9 +291,6 @@ def toggle_spam(request, post, **kwargs):
     else:
         text = f"restored post from spam"
 
-        # Set indexed flag to False, so it's removed from spam index
-        Post.objects.filter(id=post.id).update(indexed=False)
-
     # Set a logging message.
     messages.success(request, text)
 
@@ -306,6 +309,7 @@ def close(request, post, **kwargs):
     """
     user = request.user
     Post.objects.filter(uid=post.uid).update(status=Post.CLOSED)
+    queue_index(post.uid)
     # Generate a rationale post on why this post is closed.
     rationale = mod_rationale(post=post, user=user,
                               template="messages/closed.md")
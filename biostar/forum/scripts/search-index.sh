@@ -18,5 +18,5 @@ set -ue
 # Set the configuration module.
 export DJANGO_SETTINGS_MODULE=conf.run.site_settings
 
-# Add BATCH_SIZE posts to search index
-python manage.py index --size ${BATCH_SIZE}
\ No newline at end of file
+# Apply up to BATCH_SIZE queued post changes to the search index
+python manage.py index --drain --size ${BATCH_SIZE}
\ No newline at end of file
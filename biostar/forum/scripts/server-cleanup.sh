@@ -18,4 +18,5 @@ export DJANGO_SETTINGS_MODULE=conf.run.site_settings
 
 python manage.py cleanup
 
+# Rewrite the changed sitemap files in export/static/sitemap.
 python manage.py sitemap
\ No newline at end of file
@@ -1,11 +1,19 @@
+import hashlib
 import logging
+import math
+import multiprocessing
 import os
+import shutil
+import tempfile
 import time
+import threading
 from itertools import count, islice
 from collections import defaultdict
 
 # Postgres specific queries should go into separate module.
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
 from django.db.models import Q
 from whoosh import writing, classify
 from whoosh.analysis import StemmingAnalyzer, StopFilter
@@ -19,7 +27,7 @@ from whoosh.index import create_in, open_dir, exists_in
 from whoosh.fields import ID, TEXT, KEYWORD, Schema, BOOLEAN, NUMERIC, DATETIME
 
 from biostar.utils.helpers import htmltomarkdown
-from biostar.forum.models import Post
+from biostar.forum.models import Post, IndexQueue
 
 logger = logging.getLogger('engine')
 
@@ -30,6 +38,13 @@ STOP = ['there', 'where', 'who', 'that', 'to', 'do', 'my', 'only', 'but', 'about
 STOP += [w for w in STOP_WORDS]
 STOP = set(STOP)
 
+# Open indexes shared by every thread in the process.
+INDEX_POOL = dict()
+INDEX_LOCK = threading.Lock()
+
+# Searchers are reused across requests but never shared between threads.
+SEARCHER_POOL = threading.local()
+
 
 def timer_func():
     """
@@ -54,6 +69,21 @@ def timer_func():
     return elapsed, progress
 
 
+class SearchPage(object):
+    """
+    Page information of a search that can be stored in the cache.
+    Mirrors the attributes of a whoosh ResultsPage used by the templates.
+    """
+
+    def __init__(self, pagenum, pagecount, total):
+        self.pagenum = pagenum
+        self.pagecount = pagecount
+        self.total = total
+
+    def is_last_page(self):
+        return self.pagecount == 0 or self.pagenum == self.pagecount
+
+
 def copy_hits(result, highlight=False):
     """
     Copy the items in results into a dict.
@@ -121,6 +151,59 @@ def init_index(dirname=None, indexname=None, schema=None):
     return ix
 
 
+def get_index(dirname=None, indexname=None):
+    """
+    Returns an index that stays open for the lifetime of the process.
+    """
+    dirname = dirname or settings.INDEX_DIR
+    indexname = indexname or settings.INDEX_NAME
+    key = (dirname, indexname)
+
+    with INDEX_LOCK:
+        if key not in INDEX_POOL:
+            INDEX_POOL[key] = init_index(dirname=dirname, indexname=indexname)
+        return INDEX_POOL[key]
+
+
+def get_searcher(ix=None):
+    """
+    Returns the searcher of the current thread for an index.
+    The searcher is refreshed only when the index generation changes.
+    """
+    ix = ix or get_index()
+    searchers = SEARCHER_POOL.__dict__.setdefault('searchers', dict())
+
+    key = (getattr(ix.storage, 'folder', id(ix.storage)), ix.indexname)
+    searcher, generation = searchers.get(key, (None, None))
+
+    # Empty indexes have no reader generation, track the index generation instead.
+    latest = ix.latest_generation()
+
+    if searcher is None:
+        searcher = ix.searcher()
+    elif generation != latest:
+        # Segments that did not change are reused by the new searcher.
+        searcher = searcher.refresh()
+
+    searchers[key] = (searcher, latest)
+
+    return searcher
+
+
+def close_searchers():
+    """
+    Closes the pooled searchers of the current thread and forgets the open indexes.
+    Needed when the index directory is removed or recreated.
+    """
+    searchers = SEARCHER_POOL.__dict__.setdefault('searchers', dict())
+    for searcher, generation in searchers.values():
+        searcher.close()
+    searchers.clear()
+
+    with INDEX_LOCK:
+        INDEX_POOL.clear()
+
+
 def print_info(dirname=None, indexname=None):
     """
     Prints information on the index.
@@ -172,6 +255,95 @@ def index_posts(posts, ix=None, overwrite=False, add_func=add_index):
     elapsed(f"Committed {total} posts to index.")
 
 
+def split_ranges(ids, parts):
+    """
+    Splits sorted primary keys into contiguous [start, end) ranges of similar size.
+    """
+    size = math.ceil(len(ids) / max(parts, 1)) or 1
+    chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+    return [(chunk[0], chunk[-1] + 1) for chunk in chunks]
+
+
+def index_range(start, end, dirname, indexname=None):
+    """
+    Indexes valid top level posts with primary keys in [start, end) into a new index.
+    Runs inside a worker process during a rebuild.
+    """
+    indexname = indexname or settings.INDEX_NAME
+    ix = init_index(dirname=dirname, indexname=indexname)
+
+    posts = Post.objects.valid_posts(is_toplevel=True, pk__gte=start, pk__lt=end)
+    posts = posts.select_related('author__profile').order_by('pk')
+
+    writer = ix.writer()
+    total = 0
+    for post in posts.iterator():
+        add_index(post=post, writer=writer)
+        total += 1
+
+    writer.commit()
+    logger.debug(f"Indexed {total} posts with pk in [{start}, {end})")
+
+    return total
+
+
+def rebuild_index(workers=1, dirname=None, indexname=None):
+    """
+    Rebuilds the whole index, splitting the posts by primary key across worker processes.
+    Each worker writes a separate index that is then merged into the live index in a single commit.
+    """
+    dirname = dirname or settings.INDEX_DIR
+    indexname = indexname or settings.INDEX_NAME
+    elapsed, progress = timer_func()
+
+    # Queued changes made before this point are covered by the rebuild.
+    last = IndexQueue.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    posts = Post.objects.valid_posts(is_toplevel=True)
+    ids = list(posts.order_by('pk').values_list('pk', flat=True))
+    ranges = split_ranges(ids, workers)
+
+    # The partial indexes are built next to the live index.
+    os.makedirs(dirname, exist_ok=True)
+    tmpdir = tempfile.mkdtemp(prefix="rebuild-", dir=dirname)
+    jobs = [(start, end, os.path.join(tmpdir, f"part-{step}"), indexname) for step, (start, end) in enumerate(ranges)]
+
+    try:
+        if workers > 1 and len(jobs) > 1:
+            # Forked workers must open their own database connections.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(processes=workers) as pool:
+                counts = pool.starmap(index_range, jobs)
+        else:
+            counts = [index_range(*job) for job in jobs]
+
+        elapsed(f"Indexed {sum(counts)} posts in {len(jobs)} parts")
+
+        # Replace the content of the live index with the merged parts.
+        ix = init_index(dirname=dirname, indexname=indexname)
+        writer = ix.writer()
+        readers = [open_dir(dirname=job[2], indexname=indexname).reader() for job in jobs]
+        try:
+            for reader in readers:
+                writer.add_reader(reader)
+            writer.commit(mergetype=writing.CLEAR)
+        finally:
+            for reader in readers:
+                reader.close()
+
+        elapsed(f"Merged {len(jobs)} parts into the index")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    # Set the indexed flags and drop the queue entries that were covered.
+    if ids:
+        posts.filter(pk__lte=ids[-1]).update(indexed=True)
+    IndexQueue.objects.filter(pk__lte=last).delete()
+
+    return sum(counts)
+
+
 def crawl(reindex=False, overwrite=False, limit=1000):
     """
     Crawl through posts in batches and add them to index.
@@ -197,14 +369,61 @@ def crawl(reindex=False, overwrite=False, limit=1000):
     return
 
 
+def drain_queue(limit=None, ix=None):
+    """
+    Applies queued index updates and deletions in a single commit.
+    Returns the number of queue entries that were processed.
+    """
+
+    limit = limit or settings.BATCH_INDEXING_SIZE
+
+    # Take the oldest entries first.
+    entries = list(IndexQueue.objects.order_by('pk').values_list('pk', 'uid')[:limit])
+    if not entries:
+        return 0
+
+    pks = [pk for pk, uid in entries]
+    uids = set(uid for pk, uid in entries)
+
+    # Only valid top level posts are kept in the index.
+    posts = Post.objects.valid_posts(uid__in=uids, is_toplevel=True).select_related('author__profile')
+
+    ix = ix or init_index()
+    writer = AsyncWriter(ix)
+
+    found = set()
+    try:
+        for post in posts:
+            add_index(post=post, writer=writer)
+            found.add(post.uid)
+
+        # Deleted, closed and spam posts are removed from the index.
+        for uid in uids - found:
+            writer.delete_by_term('uid', text=uid)
+
+        writer.commit()
+    except Exception as exc:
+        # Entries are kept in the queue and retried on the next run.
+        writer.cancel()
+        logger.error(f'Error updating index: {exc}')
+        return 0
+
+    IndexQueue.objects.filter(pk__in=pks).delete()
+    Post.objects.filter(uid__in=found).update(indexed=True)
+
+    logger.debug(f"Indexed {len(found)} posts, removed {len(uids - found)} posts from index")
+
+    return len(entries)
+
+
 def whoosh_search(query, limit=10, page=1, ix=None, fields=None, reverse=False, sortedby=[], **kwargs):
     """
     Query search index
     """
 
     fields = fields or ['tags', 'title', 'content', 'author']
-    ix = ix or init_index()
-    searcher = ix.searcher()
+    ix = ix or get_index()
+    searcher = get_searcher(ix)
 
     # Splits the query into words and applies
     # and OR filter, eg. 'foo bar' == 'foo OR bar'
@@ -219,23 +438,49 @@ def whoosh_search(query, limit=10, page=1, ix=None, fields=None, reverse=False,
     return hits
 
 
+def search_cache_key(ix, **kwargs):
+    """
+    Cache key for a search. The index generation is part of the key,
+    so results are invalidated whenever the index changes.
+    """
+    # Whitespace does not change the meaning of the query.
+    kwargs['query'] = " ".join(kwargs['query'].split())
+
+    params = repr(sorted(kwargs.items())).encode('utf-8')
+    digest = hashlib.md5(params).hexdigest()
+
+    return f"search-{ix.indexname}-{ix.latest_generation()}-{digest}"
+
+
 def perform_search(query, page=1, fields=None, reverse=False, sortedby=[], limit=None):
     """
-    Utility functions to search whoosh index, collect results and closes
+    Utility functions to search whoosh index and collect results.
+    Highlighted results are cached until the index changes.
     """
 
     limit = limit or settings.SEARCH_LIMIT
+    fields = fields or ['tags', 'title', 'content', 'author']
+
+    ix = get_index()
+    key = search_cache_key(ix, query=query, page=page, fields=fields, reverse=reverse,
+                           sortedby=sortedby, limit=limit)
 
-    indexed = whoosh_search(query=query, fields=fields, page=page, reverse=reverse, sortedby=sortedby, limit=limit)
+    found = cache.get(key)
+    if found is not None:
+        return found
+
+    indexed = whoosh_search(query=query, fields=fields, page=page, reverse=reverse, sortedby=sortedby, limit=limit,
+                            ix=ix)
 
     # Highlight the whoosh results.
     copier = lambda r: copy_hits(r, highlight=True)
 
     final = list(map(copier, indexed))
+    pager = SearchPage(pagenum=indexed.pagenum, pagecount=indexed.pagecount, total=indexed.total)
 
-    indexed.results.searcher.close()
+    cache.set(key, (final, pager), settings.SEARCH_CACHE_TIMEOUT)
 
-    return final, indexed
+    return final, pager
 
 
 def more_like_this(uid, top=0, sortedby=[]):
@@ -249,13 +494,11 @@ def more_like_this(uid, top=0, sortedby=[]):
 
     if len(found):
         hits = found[0].more_like_this("content", top=top)
-        # Copy hits to list and close searcher object.
+        # Copy hits to list, the searcher stays open in the pool.
         final = list(map(copy_hits, hits))
     else:
         final = []
 
-    found.results.searcher.close()
-
     return final
 
 
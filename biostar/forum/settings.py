@@ -21,7 +21,11 @@ MESSAGES_PER_PAGE = 100
 TAGS_PER_PAGE = 50
 AWARDS_PER_PAGE = 50
 
-STATS_DIR = os.path.join(BASE_DIR, "export", "stats")
+# How many days the stats range api returns at once.
+STATS_RANGE_MAX = 366
+
+# How long the traffic numbers stay in the cache (seconds).
+TRAFFIC_CACHE_TIMEOUT = 60
 
 
 # Enable image upload
@@ -59,12 +63,19 @@ SEARCH_LIMIT = 50
 # Initialize the planet app.
 INIT_PLANET = False
 
+# How long search results may stay in the cache (seconds).
+# Results are also invalidated whenever the search index changes.
+SEARCH_CACHE_TIMEOUT = 60 * 60
+
 # Minimum amount of characters to preform searches
 SEARCH_CHAR_MIN = 1
 
 # How many posts to index in one job.
 BATCH_INDEXING_SIZE = 1000
 
+# Seconds between two checks of the search index queue.
+INDEX_QUEUE_INTERVAL = 5
+
 # Add another context processor to first template.
 TEMPLATES[0]['OPTIONS']['context_processors'] += [
     'biostar.forum.context.forum'
@@ -78,8 +89,14 @@ REPLIES_FEED_COUNT = 15
 
 SIMILAR_FEED_COUNT = 30
 
+# Characters of content stored for each precomputed similar post.
+SIMILAR_CONTENT_LEN = 250
+
 SESSION_UPDATE_SECONDS = 10
 
+# How long the counter values seen by a user are kept (seconds).
+COUNTER_MARKS_TIMEOUT = 30 * 24 * 3600
+
 # Maximum number of awards every SESSION_UPDATE_SECONDS.
 MAX_AWARDS = 2
 
@@ -142,9 +159,37 @@ ROOT_URLCONF = 'biostar.forum.urls'
 
 WSGI_APPLICATION = 'biostar.wsgi.application'
 
+# How long the snapshot of a thread may stay in the cache (seconds).
+THREAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# How many rendered markdown texts are kept in memory per process.
+MARKDOWN_CACHE_SIZE = 1000
+
+# The position of the batch award sweep.
+AWARD_STATE_FILE = join(BASE_DIR, "export", "awards.json")
+
+# The last primary key written by the rerender command.
+RENDER_CHECKPOINT = join(BASE_DIR, "export", "rerender.checkpoint")
+
+# How long a generated feed is served from the cache (seconds).
+FEED_CACHE_TIMEOUT = 60 * 10
+
+# The directory with the compressed sitemap files and the index, served by the web server as static files.
+SITEMAP_DIR = join(STATIC_ROOT, "sitemap")
+
+# The url the sitemap directory is served from, must match the location of the directory above.
+SITEMAP_URL = "/static/sitemap/"
+
+# Posts in a sitemap file are a range of primary keys of this width (at most 50K urls per file).
+SITEMAP_SHARD_SIZE = 50000
+
 # Time between two accesses from the same IP to qualify as a different view (seconds)
 POST_VIEW_TIMEOUT = 300
 
+# How long buffered post views wait in the cache to be stored (seconds).
+# Views are buffered only when the cache is shared between processes, otherwise they are stored directly.
+POST_VIEW_BUFFER_TIMEOUT = 60 * 60 * 24
+
 # This flag is used flag situation where a data migration is in progress.
 # Allows us to turn off certain type of actions (for example sending emails).
 DATA_MIGRATION = False
@@ -1,11 +1,12 @@
 import logging
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from taggit.models import Tag
 from django.db.models import F, Q
 from biostar.accounts.models import Profile, Message, User
-from biostar.forum.models import Post, Award, Subscription
-from biostar.forum import tasks, auth, util
+from biostar.planet.models import BlogPost
+from biostar.forum.models import Post, Award, Subscription, Log, queue_index
+from biostar.forum import tasks, auth, counters, util
 
 
 logger = logging.getLogger("engine")
@@ -56,7 +57,22 @@ def ban_user(sender, instance, created, **kwargs):
 
     # Label all posts by a spammer as 'spam'
     if instance.is_spammer:
-        Post.objects.filter(author=instance.user).update(spam=Post.SPAM)
+        posts = Post.objects.filter(author=instance.user)
+        queue_index(*posts.filter(is_toplevel=True).values_list('uid', flat=True))
+        count = posts.update(spam=Post.SPAM)
+        counters.incr(counters.SPAM, delta=count)
+
+
+@receiver(post_save, sender=Log)
+def count_log(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(counters.MODS)
+
+
+@receiver(post_save, sender=BlogPost)
+def count_blog_post(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(counters.PLANET)
 
 
 @receiver(post_save, sender=Post)
@@ -101,8 +117,16 @@ def finalize_post(sender, instance, created, **kwargs):
 
         # Save the instance.
         instance.save()
+
         instance.update_parent_counts()
 
+        # The first answer or comment of a thread changes the statistics of its tags.
+        if instance.root_id != instance.pk:
+            answers, comments = Post.objects.filter(pk=instance.root_id).values_list('answer_count', 'comment_count').first()
+            answered = int(instance.type == Post.ANSWER and answers == 1)
+            commented = int(instance.type == Post.COMMENT and comments == 1)
+            auth.change_tag_stats(instance.root.parse_tags(), answered=answered, commented=commented)
+
         # Bump the root rank when a new answer is added.
         if instance.is_answer:
             Post.objects.filter(uid=instance.root.uid).update(rank=util.now().timestamp())
@@ -121,10 +145,23 @@ def finalize_post(sender, instance, created, **kwargs):
 
     # Set the tags on the instance.
     if instance.is_toplevel:
-        tags = [Tag.objects.get_or_create(name=name)[0] for name in instance.parse_tags()]
+        old, names = set(instance.tags.names()), set(instance.parse_tags())
+        tags = [Tag.objects.get_or_create(name=name)[0] for name in names]
         instance.tags.clear()
         instance.tags.add(*tags)
 
+        # Added tags count the thread, removed tags no longer do.
+        if old != names:
+            answers, comments = Post.objects.filter(pk=instance.pk).values_list('answer_count', 'comment_count').first()
+            answered, commented = int(answers > 0), int(comments > 0)
+            auth.change_tag_stats(names - old, total=1, answered=answered, commented=commented)
+            auth.change_tag_stats(old - names, total=-1, answered=-answered, commented=-commented)
+    else:
+        names = instance.root.parse_tags()
+
+    # The thread was edited.
+    auth.change_tag_stats(names, date=instance.lastedit_date)
+
     # Ensure spam posts get closed status
     if instance.is_spam:
         Post.objects.filter(uid=instance.uid).update(status=Post.CLOSED)
@@ -135,7 +172,8 @@ def finalize_post(sender, instance, created, **kwargs):
         Post.objects.filter(uid=instance.uid).update(title=title)
 
     # Ensure posts get re-indexed after being edited.
-    Post.objects.filter(uid=instance.uid).update(indexed=False)
+    if instance.is_toplevel:
+        queue_index(instance.uid)
 
     # Exclude current authors from receiving messages from themselves
     subs = subs.exclude(Q(type=Subscription.NO_MESSAGES) | Q(user=instance.author))
@@ -149,7 +187,22 @@ def finalize_post(sender, instance, created, **kwargs):
                                  extra_context=extra_context)
 
 
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    # Removed posts are dropped from the search index.
+    if instance.is_toplevel:
+        queue_index(instance.uid)
+
+
 @receiver(post_save, sender=Post)
 def check_spam(sender, instance, created, **kwargs):
     # Classify post as spam/ham.
     tasks.spam_check.spool(uid=instance.uid)
+
+
+@receiver(post_delete, sender=Post)
+def delete_tag_stats(sender, instance, **kwargs):
+    # Removed threads no longer count towards their tags.
+    if instance.is_toplevel:
+        answered, commented = int(instance.answer_count > 0), int(instance.comment_count > 0)
+        auth.change_tag_stats(instance.parse_tags(), total=-1, answered=-answered, commented=-commented)
@@ -111,62 +111,205 @@ def created_post(pid):
 @task
 def create_user_awards(user_id, limit=None):
     from biostar.accounts.models import User
-    from biostar.forum.models import Award, Badge, Post
-    from biostar.forum.awards import ALL_AWARDS
-    from biostar.forum import util, auth
+    from biostar.forum.models import Award
+    from biostar.forum import auth
     from django.conf import settings
 
     limit = limit or settings.MAX_AWARDS
 
-    user = User.objects.filter(id=user_id).first()
-    # debugging
-    # Award.objects.all().delete()
+    users = User.objects.filter(id=user_id)
 
     # Collect valid targets
-    valid = auth.valid_awards(user=user)
+    valid = auth.valid_awards(users=users)
 
     # Pick random awards to give to user
     random.shuffle(valid)
 
     valid = valid[:limit]
 
-    for target in valid:
-        user, badge, date, post = target
+    Award.objects.bulk_create(valid)
 
-        # Set the award date to the post edit date
-        date = post.lastedit_date if post else date
-
-        # Create an award for each target.
-        Award.objects.create(user=user, badge=badge, date=date, post=post)
-
-        message(f"award {badge.name} created for {user.email}")
+    message(f"{len(valid)} awards created for user={user_id}")
 
 
 def batch_create_awards(limit=100):
+    """
+    Gives awards to the users that were active since the previous sweep, limit users per run.
+    A sweep goes through the users in order of their ids, its position is kept in AWARD_STATE_FILE.
+    """
+    import json
+    from datetime import datetime
     from biostar.accounts.models import User
     from biostar.forum import auth, models, util
 
-    # Randomly order awards
-    users = User.objects.order_by('?')[:limit]
+    path = settings.AWARD_STATE_FILE
+    state = {}
+    if os.path.isfile(path):
+        with open(path, "rt") as fp:
+            state = json.load(fp)
+
+    # The sweep covers the users active since the start of the previous sweep.
+    since = state.get("since")
+    started = state.get("started") or util.now().isoformat()
+    after = state.get("after", 0)
+
+    users = User.objects.all()
+    if since:
+        since = datetime.fromisoformat(since)
+        posted = models.Post.objects.filter(lastedit_date__gte=since).values("author_id")
+        voted = models.Vote.objects.filter(date__gte=since).values("post__author_id")
+        users = users.filter(Q(profile__last_login__gte=since) | Q(id__in=posted) | Q(id__in=voted))
+
+    ids = list(users.filter(id__gt=after).order_by("id").values_list("id", flat=True)[:limit])
+
+    # Collect the valid targets for the users at once.
+    valid = auth.valid_awards(users=User.objects.filter(id__in=ids))
+    models.Award.objects.bulk_create(valid, batch_size=limit)
+
+    if len(ids) < limit:
+        # The sweep is complete, the next one starts from the beginning.
+        state = dict(since=started, started=None, after=0)
+    else:
+        state = dict(since=state.get("since"), started=started, after=ids[-1])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wt") as fp:
+        json.dump(state, fp)
+    os.replace(f"{path}.tmp", path)
+
+    logger.info(f"{len(valid)} awards given to {len({a.user_id for a in valid})} of {len(ids)} users")
+
+
+def batch_similar_posts(limit=1000):
+    """
+    Computes similar posts for threads that are new or changed since the last run.
+    """
+    import json
+    from django.db.models import F, Q
+    from biostar.forum import search, util
+    from biostar.forum.models import Post, Similar
+
+    # Any change in a thread updates the last edit date of the root.
+    posts = Post.objects.valid_posts(is_toplevel=True)
+    posts = posts.filter(Q(similar=None) | Q(lastedit_date__gt=F('similar__date')))
+    posts = posts.order_by('-lastedit_date').only('id', 'uid')[:limit]
+
+    now = util.now()
+    count = 0
+    for post in posts:
+        hits = search.more_like_this(uid=post.uid)
+
+        # Keep only what the similar posts feed displays.
+        data = [dict(uid=hit['uid'], title=hit['title'], content=(hit['content'] or '')[:settings.SIMILAR_CONTENT_LEN])
+                for hit in hits]
 
-    # Aggregate target awards into flat list
-    targets = []
-    for u in users:
-        valid = auth.valid_awards(user=u)
-        targets.extend(valid)
+        Similar.objects.update_or_create(post=post, defaults=dict(data=json.dumps(data), date=now))
+        count += 1
 
-    def batch():
-        for target in targets:
-            if not target:
-                continue
-            user, badge, date, post = target
-            award = models.Award(user=user, badge=badge, date=date, post=post)
-            logger.debug(f"awarded {award.badge.name} to {user}")
+    logger.info(f"computed similar posts for {count} threads")
 
-            yield award
 
-    models.Award.objects.bulk_create(objs=batch(), batch_size=limit)
-    logger.info(f"{len(targets)} awards given to {len(users)} users")
+def batch_reconcile_votes(limit=5000):
+    """
+    Recomputes the vote counters of every post, limit posts at a time.
+    """
+    from biostar.forum import auth
+    from biostar.forum.models import Post
+
+    last = Post.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    fixed = 0
+    for start in range(0, last + 1, limit):
+        fixed += auth.reconcile_votes(start=start, end=start + limit)
+
+    logger.info(f"reconciled vote counts on {fixed} posts")
+
+
+def batch_reconcile_tags(limit=1000):
+    """
+    Recounts the statistics of every tag, limit tags at a time.
+    """
+    from taggit.models import Tag
+    from biostar.forum import auth
+
+    last = Tag.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    fixed = 0
+    for start in range(0, last + 1, limit):
+        fixed += auth.update_tag_stats(Tag.objects.filter(pk__gte=start, pk__lt=start + limit))
+
+    logger.info(f"reconciled statistics on {fixed} tags")
+
+
+def batch_daily_stats():
+    """
+    Adds the daily statistics that are missing up to yesterday.
+    All missing days are counted in one pass, grouped by date.
+    """
+    from datetime import datetime, timedelta
+    from django.db.models import Count, Q
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+    from biostar.accounts.models import Profile
+    from biostar.forum.models import Post, Vote, DailyStats
+
+    end = timezone.localdate()
+    last = DailyStats.objects.order_by('-date').first()
+
+    if last:
+        start = last.date + timedelta(days=1)
+    else:
+        # Start from the first day with any activity.
+        firsts = [Post.objects.order_by('creation_date').values_list('creation_date', flat=True).first(),
+                  Profile.objects.order_by('date_joined').values_list('date_joined', flat=True).first(),
+                  Vote.objects.order_by('date').values_list('date', flat=True).first()]
+        firsts = [timezone.localtime(date).date() for date in firsts if date]
+        start = min(firsts) if firsts else end
+
+    if start >= end:
+        return 0
+
+    lower = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+    upper = timezone.make_aware(datetime.combine(end, datetime.min.time()))
+
+    def per_day(query, field, **counts):
+        query = query.filter(**{f"{field}__gte": lower, f"{field}__lt": upper})
+        rows = query.annotate(day=TruncDate(field)).values('day').annotate(total=Count('id'), **counts)
+        return {row['day']: row for row in rows}
+
+    toplevel = Q(type__in=Post.TOP_LEVEL) & ~Q(type=Post.BLOG)
+    posts = per_day(Post.objects.all(), 'creation_date',
+                    questions=Count('id', filter=Q(type=Post.QUESTION)),
+                    answers=Count('id', filter=Q(type=Post.ANSWER)),
+                    comments=Count('id', filter=Q(type=Post.COMMENT)),
+                    toplevel=Count('id', filter=toplevel))
+    votes = per_day(Vote.objects.all(), 'date')
+    users = per_day(Profile.objects.all(), 'date_joined')
+
+    # The totals continue from the last day stored.
+    totals = {key: getattr(last, key, 0) for key in DailyStats.TOTALS}
+
+    stats = []
+    day = start
+    while day < end:
+        post = posts.get(day, {})
+        for key in ('questions', 'answers', 'toplevel', 'comments'):
+            totals[key] += post.get(key, 0)
+
+        new_votes = votes.get(day, {}).get('total', 0)
+        new_users = users.get(day, {}).get('total', 0)
+        totals['votes'] += new_votes
+        totals['users'] += new_users
+
+        stats.append(DailyStats(date=day, new_posts=post.get('total', 0), new_votes=new_votes,
+                                new_users=new_users, **totals))
+        day += timedelta(days=1)
+
+    DailyStats.objects.bulk_create(stats, batch_size=1000)
+
+    logger.info(f"added daily statistics for {len(stats)} days")
+
+    return len(stats)
 
 
 def high_trust(user, minscore=50):
@@ -184,9 +327,10 @@ def low_trust(user, minscore=50):
 
 @task
 def spam_check(uid):
-    from biostar.forum.models import Post, Log, delete_post_cache
+    from biostar.forum.models import Post, Log, delete_post_cache, queue_index
     from biostar.accounts.models import User, Profile
     from biostar.forum.auth import db_logger
+    from biostar.forum import counters
 
     post = Post.objects.filter(uid=uid).first()
     author = post.author
@@ -224,6 +368,10 @@ def spam_check(uid):
         if flag:
 
             Post.objects.filter(uid=post.uid).update(spam=Post.SPAM, status=Post.CLOSED)
+            counters.incr(counters.SPAM)
+
+            # Remove the post from the search index.
+            queue_index(post.uid)
 
             # Get the first admin.
             user = User.objects.filter(is_superuser=True).order_by("pk").first()
@@ -303,8 +451,7 @@ def notify_followers(sub_ids, author_id, uid, extra_context={}):
     author = User.objects.filter(id=author_id).first()
     subs = Subscription.objects.filter(id__in=sub_ids)
 
-    users = [sub.user for sub in subs]
-    user_ids = [u.pk for u in users]
+    user_ids = list(subs.values_list('user_id', flat=True))
 
     # Update template context with post
     extra_context.update(dict(post=post))
@@ -323,7 +470,7 @@ def notify_followers(sub_ids, author_id, uid, extra_context={}):
     if not email_subs:
         return
 
-    recipient_list = [sub.user.email for sub in email_subs]
+    recipient_list = list(email_subs.values_list('user__email', flat=True))
     from_email = settings.DEFAULT_NOREPLY_EMAIL
 
     send_email(template_name=email_template,
@@ -10,7 +10,6 @@ import bleach
 from django import template, forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator
 from django.db.models import Count
 from django.shortcuts import reverse
 from django.utils.safestring import mark_safe
@@ -240,6 +239,7 @@ def unread(message, user):
 @register.simple_tag
 def toggle_unread(user):
     Message.objects.filter(recipient=user, unread=True).update(unread=False)
+    Profile.objects.filter(user=user).update(new_messages=0)
     return ''
 
 
@@ -447,6 +447,8 @@ def get_post_list(target, request, show=None):
     """
     Return post list belonging to a user
     """
+    from biostar.forum.views import KeysetPaginator
+
     user = request.user
     page = request.GET.get("page", 1)
     posts = Post.objects.valid_posts(u=user, author=target)
@@ -460,10 +462,11 @@ def get_post_list(target, request, show=None):
     posts = posts.filter(type=type_filter) if type_filter is not None else posts
 
     posts = posts.select_related("root").select_related("author__profile", "lastedit_user__profile")
-    posts = posts.order_by("-rank")
+    posts = posts.order_by("-rank", "-pk")
 
-    # Cache the users posts add pagination to posts.
-    paginator = Paginator(object_list=posts, per_page=settings.POSTS_PER_PAGE)
+    # Seek to the page with the cursors when present.
+    paginator = KeysetPaginator(object_list=posts, per_page=settings.POSTS_PER_PAGE, order="-rank",
+                                after=request.GET.get("after"), before=request.GET.get("before"))
     posts = paginator.get_page(page)
 
     return posts
@@ -584,6 +587,9 @@ def relative_url(context, value, field_name, urlencode=None):
 
     def apply_filter(param):
         key = param.split('=')[0]
+        # Cursors are only valid for the page they were made on.
+        if key in const.CURSOR_PARAMS:
+            return
         # Return parameter if in valid const.
         if key != field_name and key in expect:
             return param
@@ -5,7 +5,7 @@ from django.urls import reverse
 from unittest.mock import patch, MagicMock
 from biostar.accounts.models import User, Profile
 
-from biostar.forum import models, views, auth, forms, const, ajax
+from biostar.forum import models, views, auth, forms, const, ajax, counters
 from biostar.utils.helpers import fake_request
 from biostar.forum.util import get_uuid
 
@@ -54,6 +54,69 @@ class PostTest(TestCase):
         self.preform_votes(post=self.post, user=self.owner)
         self.preform_votes(post=self.post, user=user2)
 
+    def test_vote_counts(self):
+        """Test vote counters and their reconciliation"""
+        user2 = User.objects.create(username="user", email="user@tested.com", password="tested")
+        answer = models.Post.objects.create(title="answer", author=user2, content="tested foo bar too for",
+                                            type=models.Post.ANSWER, parent=self.post)
+
+        self.preform_votes(post=answer, user=self.owner)
+
+        answer = models.Post.objects.get(pk=answer.pk)
+        root = models.Post.objects.get(pk=self.post.pk)
+        self.assertEqual((answer.vote_count, answer.book_count, answer.accept_count), (3, 1, 1))
+        self.assertEqual((root.thread_votecount, root.accept_count), (3, 1))
+
+        # Reconciliation restores corrupted counters.
+        models.Post.objects.update(vote_count=10, book_count=10, accept_count=10, thread_votecount=10)
+        auth.reconcile_votes(start=0, end=answer.pk + 1)
+
+        answer = models.Post.objects.get(pk=answer.pk)
+        root = models.Post.objects.get(pk=self.post.pk)
+        self.assertEqual((answer.vote_count, answer.book_count, answer.accept_count), (3, 1, 1))
+        self.assertEqual((root.vote_count, root.thread_votecount, root.accept_count), (0, 3, 1))
+
+    @patch('biostar.forum.counters.shared_cache', lambda: True)
+    def test_session_counts(self):
+        """Test the cached session counters"""
+        from django.core.cache import cache
+        cache.clear()
+
+        user2 = User.objects.create(username="user", email="user@tested.com", password="tested")
+        answer = models.Post.objects.create(title="answer", author=user2, content="tested foo bar too for",
+                                            type=models.Post.ANSWER, parent=self.post)
+
+        # The first update only sets the marks.
+        counts = counters.get_counts(user=user2)
+        self.assertEqual((counts['vote_count'], counts['mod_count']), (0, 0))
+
+        self.preform_votes(post=answer, user=self.owner)
+        auth.db_logger(user=self.owner, text="test log")
+
+        with self.assertNumQueries(0):
+            counts = counters.get_counts(user=user2)
+        self.assertEqual((counts['vote_count'], counts['mod_count']), (3, 1))
+
+        # Counts restart after each update.
+        counts = counters.get_counts(user=user2)
+        self.assertEqual((counts['vote_count'], counts['mod_count']), (0, 0))
+
+    def test_session_counts_query(self):
+        """Test the session counters queried without a shared cache"""
+        from django.utils import timezone
+        user2 = User.objects.create(username="user", email="user@tested.com", password="tested")
+        Profile.objects.filter(user=user2).update(last_login=timezone.now())
+        user2 = User.objects.get(pk=user2.pk)
+        answer = models.Post.objects.create(title="answer", author=user2, content="tested foo bar too for",
+                                            type=models.Post.ANSWER, parent=self.post)
+
+        # Writes made in other processes are counted.
+        self.preform_votes(post=answer, user=self.owner)
+        auth.db_logger(user=self.owner, text="test log")
+
+        counts = counters.get_counts(user=user2)
+        self.assertEqual((counts['vote_count'], counts['mod_count']), (3, 1))
+
     def test_drag_and_drop(self):
         """
         Test AJAX function used to drag and drop.
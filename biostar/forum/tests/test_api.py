@@ -60,3 +60,55 @@ class PostAPITest(TestCase):
         #self.process_response(response=response)
 
 
+
+    def test_tags_list(self):
+        """Test the tag counts for an uploaded list of tags"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import Client
+
+        models.Post.objects.create(title="Tagged", author=self.owner, content="Test",
+                                   type=models.Post.QUESTION, tag_val="count1,count2")
+
+        tags = SimpleUploadedFile("tags.txt", b"count1\nCOUNT2\nmissing\n")
+        response = Client().post(reverse("api_tags_list"), data=dict(tags=tags))
+        data = response.json()
+
+        self.assertEqual(data["count1"], dict(total=1, answer_count=0, comment_count=0))
+        self.assertEqual(data["count2"]["total"], 1)
+        self.assertEqual(data["missing"]["total"], 0)
+
+    def test_daily_stats(self):
+        """Test the daily statistics rollups"""
+        from django.utils import timezone
+        from biostar.forum import tasks
+
+        # Move the activity into the past days.
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        models.Post.objects.update(creation_date=yesterday - datetime.timedelta(days=2))
+        models.Post.objects.create(title="Recent", author=self.owner, content="Test", type=models.Post.QUESTION,
+                                   creation_date=yesterday)
+
+        days = tasks.batch_daily_stats()
+        self.assertTrue(days >= 3)
+
+        # Later runs only add the missing days.
+        self.assertEqual(tasks.batch_daily_stats(), 0)
+
+        last = models.DailyStats.objects.order_by('-date').first()
+        self.assertEqual(last.questions, 2)
+        self.assertEqual(last.new_posts, 1)
+
+        start = last.date - datetime.timedelta(days=2)
+        url = reverse("api_stats_range", kwargs=dict(start=start.isoformat(), end=last.date.isoformat()))
+        data = self.client.get(url).json()
+        self.assertEqual([row["questions"] for row in data], [1, 1, 2])
+        self.assertEqual(data[-1]["new_post_count"], 1)
+
+        # The day endpoints list the new objects, the current day is counted live.
+        stats = api.compute_stats(yesterday)
+        self.assertEqual(len(stats["new_posts"]), 1)
+        self.assertEqual(stats["questions"], 2)
+
+        models.Post.objects.create(title="Today", author=self.owner, content="Test", type=models.Post.QUESTION)
+        stats = api.compute_stats(timezone.now())
+        self.assertEqual((len(stats["new_posts"]), stats["questions"]), (1, 3))
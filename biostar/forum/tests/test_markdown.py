@@ -88,7 +88,26 @@ class MarkdownTest(TestCase):
         self.answer = models.Post.objects.create(title="Test", author=self.owner, content="Test",
                                                  type=models.Post.ANSWER, uid="2")
 
-        pass
+        # Rendered html depends on the database content.
+        markdown.HTML_CACHE.clear()
+
+    def test_markdown_cache(self):
+        """
+        Test the rendered html cache
+        """
+        markdown.HTML_CACHE.clear()
+
+        text = "Some **bold** text"
+        html = markdown.parse(text, clean=True, escape=False)
+        self.assertEqual(len(markdown.HTML_CACHE), 1)
+
+        # The same input is served from the cache.
+        self.assertEqual(markdown.parse(text, clean=True, escape=False), html)
+        self.assertEqual(len(markdown.HTML_CACHE), 1)
+
+        # Different options are rendered separately.
+        markdown.parse(text, clean=True, escape=True)
+        self.assertEqual(len(markdown.HTML_CACHE), 2)
 
     def test_markdown(self):
 
@@ -111,3 +130,25 @@ class MarkdownTest(TestCase):
 
         # Catch all errors at once.
         self.assertTrue(error_count == 0)
+
+    def test_rerender(self):
+        """
+        Test rendering the html of all posts again
+        """
+        import tempfile
+
+        models.Post.objects.all().update(html="")
+
+        with tempfile.NamedTemporaryFile(mode="wt", suffix=".checkpoint") as fp:
+            total, changed = markdown.rerender(chunk=1, checkpoint=fp.name)
+
+            self.assertEqual(total, models.Post.objects.count())
+            self.assertEqual(changed, total)
+            self.assertFalse(models.Post.objects.filter(html="").exists())
+
+            last = models.Post.objects.order_by("-pk").first()
+            self.assertEqual(open(fp.name).read(), str(last.pk + 1))
+
+        # Unchanged html is not written again.
+        total, changed = markdown.rerender()
+        self.assertEqual(changed, 0)
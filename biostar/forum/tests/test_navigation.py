@@ -87,3 +87,77 @@ class ForumNavigation(TestCase):
 
 
 
+
+    def test_keyset_pages(self):
+        "Checking that cursor pages match the offset pages"
+        from biostar.forum.views import KeysetPaginator
+
+        for i in range(8):
+            models.Post.objects.create(title=f"Test {i}", author=self.owner, content="Test", type=models.Post.QUESTION)
+
+        # Posts sharing a rank are ordered by primary key.
+        models.Post.objects.filter(pk__in=models.Post.objects.order_by("pk")[:3].values("pk")).update(rank=1)
+
+        posts = models.Post.objects.order_by("-rank", "-pk")
+        expected = list(posts)
+        size = 3
+
+        # Walk forward with the next cursors.
+        seen, cursor, number = [], None, 1
+        while True:
+            paginator = KeysetPaginator(object_list=posts, per_page=size, order="-rank", after=cursor)
+            page = paginator.get_page(number)
+            seen.extend(page.object_list)
+            if not page.has_next():
+                break
+            cursor, number = page.next_cursor, number + 1
+
+        self.assertEqual(seen, expected)
+        self.assertTrue(number > 2)
+
+        # Walk back one page with the previous cursor.
+        paginator = KeysetPaginator(object_list=posts, per_page=size, order="-rank", before=page.previous_cursor)
+        back = paginator.get_page(number - 1)
+        self.assertEqual(back.object_list, expected[(number - 2) * size:(number - 1) * size])
+
+        # The links carry the cursors.
+        c = Client()
+        resp = c.get(reverse("post_list"), data=dict(after=page.next_cursor, page=2))
+        self.assertEqual(resp.status_code, 200)
+
+    def test_sitemap(self):
+        """
+        Test writing the sitemap shards and rewriting only the changed ones
+        """
+        import gzip, tempfile
+        from biostar.forum.management.commands.sitemap import build_sitemap, shard_name
+
+        for step in range(4):
+            models.Post.objects.create(title=f"Sitemap {step}", author=self.owner, content="Test",
+                                       type=models.Post.QUESTION)
+
+        posts = models.Post.objects.filter(is_toplevel=True).order_by("pk")
+        size = 2
+
+        with tempfile.TemporaryDirectory() as outdir:
+            written = build_sitemap(outdir=outdir, size=size)
+            self.assertTrue(written > 1)
+
+            # Every open question is listed once.
+            urls = ""
+            for name in os.listdir(outdir):
+                if name.endswith(".gz"):
+                    urls += gzip.open(os.path.join(outdir, name), 'rt').read()
+            for post in posts:
+                self.assertEqual(urls.count(f"/p/{post.uid}/"), 1)
+            self.assertIn(shard_name(posts.last().pk // size), open(os.path.join(outdir, "sitemap.xml")).read())
+
+            # Nothing changed since the last run.
+            self.assertEqual(build_sitemap(outdir=outdir, size=size), 0)
+
+            # Closing a post rewrites its shard only.
+            post = posts.last()
+            models.Post.objects.filter(pk=post.pk).update(status=models.Post.CLOSED)
+            self.assertEqual(build_sitemap(outdir=outdir, size=size), 1)
+            text = gzip.open(os.path.join(outdir, shard_name(post.pk // size)), 'rt').read()
+            self.assertNotIn(post.uid, text)
@@ -1,3 +1,4 @@
+import json
 import logging
 import os
 import shutil
@@ -5,7 +6,9 @@ from django.core import management
 from django.urls import reverse
 from django.test import TestCase, override_settings
 from django.conf import settings
-from biostar.forum import models, views, search, tasks, feed
+from django.core.cache import cache
+from unittest.mock import patch
+from biostar.forum import models, views, search, tasks, util
 from biostar.utils.helpers import fake_request
 from biostar.accounts.models import User
 
@@ -60,6 +63,50 @@ class PostTest(TestCase):
         self.owner.profile.save()
         tasks.create_user_awards(self.owner.id)
 
+    def test_batch_awards(self):
+        """
+        Test the batch award engine
+        """
+        import tempfile
+        from django.db import connection
+        from django.utils import timezone
+        from django.test.utils import CaptureQueriesContext
+
+        models.Profile.objects.filter(user=self.owner).update(text="TESTING" * 20, score=10)
+        models.Post.objects.filter(id=self.post.id).update(vote_count=10)
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(AWARD_STATE_FILE=os.path.join(tmp, "a.json")):
+            tasks.batch_create_awards(limit=100)
+
+            names = set(models.Award.objects.filter(user=self.owner).values_list("badge__name", flat=True))
+            self.assertIn("Autobiographer", names)
+
+            # A post earns a single award.
+            self.assertEqual(models.Award.objects.filter(post=self.post).count(), 1)
+
+            # Awards are not given twice.
+            count = models.Award.objects.count()
+            for i in range(5):
+                user = User.objects.create(username=f"user{i}", email=f"user{i}@tested.com")
+                models.Post.objects.create(title="Test", author=user, content="Test", type=models.Post.QUESTION)
+
+            with CaptureQueriesContext(connection) as first:
+                tasks.batch_create_awards(limit=100)
+            self.assertEqual(models.Award.objects.count(), count)
+
+            # A sweep continues from the last user of the previous run.
+            active = models.Profile.objects.filter(user__username__startswith="user")
+            active.update(text="TESTING" * 20, score=10, last_login=timezone.now())
+            with CaptureQueriesContext(connection) as second:
+                tasks.batch_create_awards(limit=2)
+            self.assertEqual(models.Award.objects.count(), count + 2)
+
+            for i in range(5):
+                tasks.batch_create_awards(limit=2)
+            self.assertEqual(models.Award.objects.count(), count + 5)
+
+        # The number of queries does not depend on the number of users, storing the awards takes one more.
+        self.assertEqual(len(first) + 1, len(second))
 
     def test_comment_traversal(self):
         """Test comment rendering pages"""
@@ -81,6 +128,72 @@ class PostTest(TestCase):
 
         self.assertTrue(response.status_code == 200, 'Error rendering comments')
 
+    @patch('biostar.forum.models.shared_cache', lambda: True)
+    def test_post_views(self):
+        """Test that post views are buffered and stored in bulk"""
+        cache.clear()
+
+        url = reverse("post_view", kwargs=dict(uid=self.post.uid))
+        request = fake_request(url=url, data={}, method="GET", user=self.owner)
+        views.post_view(request=request, uid=self.post.uid)
+        views.post_view(request=request, uid=self.post.uid)
+
+        self.assertFalse(models.PostView.objects.exists(), "View stored on the request path.")
+
+        models.flush_post_views()
+
+        self.assertEqual(models.PostView.objects.filter(post=self.post).count(), 1)
+        self.assertEqual(models.Post.objects.get(pk=self.post.pk).view_count, 1)
+
+        # A view whose entry is written after a flush is stored by the next one.
+        index = cache.incr(models.VIEW_SEQ_KEY)
+        models.flush_post_views()
+        cache.set(models.view_key(index), (self.post.id, "1.1.1.1"))
+        models.flush_post_views()
+        self.assertEqual(models.Post.objects.get(pk=self.post.pk).view_count, 2)
+
+    def test_post_views_direct(self):
+        """Test that post views are stored directly without a shared cache"""
+        cache.clear()
+
+        url = reverse("post_view", kwargs=dict(uid=self.post.uid))
+        request = fake_request(url=url, data={}, method="GET", user=self.owner)
+        views.post_view(request=request, uid=self.post.uid)
+
+        self.assertEqual(models.Post.objects.get(pk=self.post.pk).view_count, 1)
+
+    def test_thread_snapshot(self):
+        """Test that the thread snapshot is reused until the thread changes"""
+        from biostar.forum import auth
+
+        answer = models.Post.objects.create(title="Test", author=self.owner, content="Test",
+                                            type=models.Post.ANSWER, root=self.post, parent=self.post)
+        root = models.Post.objects.get(pk=self.post.pk)
+        auth.post_tree(user=self.owner, root=root)
+
+        with self.assertNumQueries(0):
+            thread, tree = auth.thread_snapshot(user=self.owner, root=root)
+        self.assertEqual([p.uid for p in thread], [answer.uid])
+
+        comment = models.Post.objects.create(title="Test", author=self.owner, content="Test",
+                                             type=models.Post.COMMENT, root=self.post, parent=answer)
+        root = models.Post.objects.get(pk=self.post.pk)
+        root, tree, answers, thread = auth.post_tree(user=self.owner, root=root)
+
+        self.assertEqual([p.uid for p in tree[answer.id]], [comment.uid], "Snapshot not rebuilt after change.")
+
+        # Moving a comment onto another comment changes the tree, also for the other processes.
+        other = models.Post.objects.create(title="Test", author=self.owner, content="Test",
+                                           type=models.Post.COMMENT, root=self.post, parent=answer)
+        root = models.Post.objects.get(pk=self.post.pk)
+        auth.post_tree(user=self.owner, root=root)
+
+        request = fake_request(url="/", data={}, user=self.owner)
+        auth.move_post(request=request, post=models.Post.objects.get(pk=other.pk), parent=comment)
+        root = models.Post.objects.get(pk=self.post.pk)
+        root, tree, answers, thread = auth.post_tree(user=self.owner, root=root)
+        self.assertEqual([p.uid for p in tree[comment.id]], [other.uid], "Snapshot not rebuilt after move.")
+
     def Xtest_edit_post(self):
         """
         Test post edit for root and descendants
@@ -139,6 +252,10 @@ class PostSearchTest(TestCase):
         if os.path.exists(TEST_INDEX_DIR):
             shutil.rmtree(TEST_INDEX_DIR)
 
+        # Pooled searchers and cached results point to the removed index.
+        search.close_searchers()
+        cache.clear()
+
         # Create some posts to index.
         self.limit = 10
         for p in range(self.limit):
@@ -181,4 +298,188 @@ class PostSearchTest(TestCase):
 
         search.print_info()
         # TODO: put back in
-        #self.assertTrue(len(whoosh_search), f"Whoosh search returned no results. At least {self.limit} expected")
\ No newline at end of file
+        #self.assertTrue(len(whoosh_search), f"Whoosh search returned no results. At least {self.limit} expected")
+
+    def test_index_queue(self):
+        """
+        Test that queued post changes reach the search index.
+        """
+        post = models.Post.objects.create(title="Queued post", author=self.owner, content="Queued content",
+                                          type=models.Post.QUESTION)
+
+        self.assertTrue(models.IndexQueue.objects.filter(uid=post.uid).exists(), "Post not added to queue.")
+
+        search.drain_queue()
+        self.assertFalse(models.IndexQueue.objects.exists(), "Index queue not drained.")
+
+        results, indexed = search.perform_search("Queued", fields=['title'])
+        self.assertTrue(post.uid in [r['uid'] for r in results], "Queued post missing from index.")
+
+        # Spam posts are removed from the index.
+        models.Post.objects.filter(uid=post.uid).update(spam=models.Post.SPAM)
+        models.queue_index(post.uid)
+        search.drain_queue()
+
+        results, indexed = search.perform_search("Queued", fields=['title'])
+        self.assertFalse(post.uid in [r['uid'] for r in results], "Spam post still in index.")
+
+    def test_searcher_pool(self):
+        """
+        Test that searchers are reused until the index changes.
+        """
+        first = search.get_searcher()
+        self.assertIs(first, search.get_searcher(), "Searcher not reused.")
+
+        models.Post.objects.create(title="Pooled post", author=self.owner, content="Pooled content",
+                                   type=models.Post.QUESTION)
+        search.drain_queue()
+
+        self.assertIsNot(first, search.get_searcher(), "Searcher not refreshed.")
+
+    def test_rebuild_index(self):
+        """
+        Test rebuilding the index from partial indexes.
+        """
+        total = search.rebuild_index(workers=1)
+
+        self.assertEqual(total, self.limit, "Rebuild did not index every post.")
+        self.assertFalse(models.IndexQueue.objects.exists(), "Index queue not cleared by rebuild.")
+
+        results, indexed = search.perform_search("post", fields=['title'])
+        self.assertEqual(len(results), self.limit, "Rebuilt index missing posts.")
+
+    def test_search_cache(self):
+        """
+        Test that repeated searches are served from the cache until the index changes.
+        """
+        search.drain_queue()
+
+        first, pager = search.perform_search("Test  post")
+        again, pager = search.perform_search("Test post")
+        self.assertEqual(first, again, "Normalized query not served from cache.")
+
+        models.Post.objects.create(title="Test post-new", author=self.owner, content="Test post-new",
+                                   type=models.Post.QUESTION)
+        search.drain_queue()
+
+        final, pager = search.perform_search("Test post")
+        self.assertEqual(len(final), len(first) + 1, "Cache not invalidated by index change.")
+
+    def test_feed_cache(self):
+        """Test the cached feeds and the conditional requests"""
+        from django.test import Client
+        cache.clear()
+
+        c = Client()
+        url = reverse('post_feed', kwargs=dict(text=self.post.uid))
+        resp = c.get(url)
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+
+        # The client already has this feed, only the feed version is looked up.
+        with self.assertNumQueries(1):
+            resp = c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        # A new post expires the feeds.
+        answer = models.Post.objects.create(title="Answer", author=self.owner, content="New answer",
+                                            type=models.Post.ANSWER, parent=self.post)
+        resp = c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+        # So does an edit, also when it is made in another process.
+        etag = resp['ETag']
+        models.Post.objects.filter(pk=answer.pk).update(content="Edited answer", lastedit_date=util.now())
+        resp = c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Edited answer")
+
+    @override_settings(SEND_MAIL=True)
+    def test_digest(self):
+        """Test sending the digest in batches"""
+        from django.core import mail
+        from biostar.accounts.models import Profile
+        from biostar.forum.management.commands import digest
+
+        for step in range(5):
+            User.objects.create(username=f"digest{step}", email=f"digest{step}@tested.com", password="tested")
+        Profile.objects.update(digest_prefs=Profile.DAILY_DIGEST)
+
+        # Error reports sent during the setup are not part of the digest.
+        mail.outbox = []
+
+        with patch.object(digest, 'BATCH_SIZE', 3):
+            sent = digest.send_digests(days=1, subject="Daily digest")
+
+        outbox = [msg for msg in mail.outbox if "Daily digest" in msg.subject]
+        self.assertEqual(sent, User.objects.count())
+        self.assertEqual(len(outbox), 3)
+        self.assertIn(self.post.title, outbox[0].body)
+
+    def test_similar_posts(self):
+        """
+        Test precomputing similar posts and serving them.
+        """
+        from biostar.forum import ajax
+
+        search.drain_queue()
+        tasks.batch_similar_posts()
+
+        self.assertEqual(models.Similar.objects.count(), self.limit, "Similar posts not computed for every thread.")
+
+        # Unchanged threads are skipped on the next run.
+        similar = models.Similar.objects.first()
+        tasks.batch_similar_posts()
+        self.assertEqual(models.Similar.objects.get(pk=similar.pk).date, similar.date, "Unchanged thread recomputed.")
+
+        url = reverse("similar_posts", kwargs=dict(uid=self.post.uid))
+        request = fake_request(url=url, data={}, method="GET", user=self.owner)
+        response = ajax.similar_posts(request=request, uid=self.post.uid)
+        self.assertEqual(response.status_code, 200, "Error serving similar posts.")
+
+        # Recomputed results are served right away.
+        other = models.Post.objects.exclude(pk=self.post.pk).first()
+        hits = [dict(uid=other.uid, title="Recomputed title", content="")]
+        models.Similar.objects.filter(post=self.post).update(data=json.dumps(hits))
+        response = ajax.similar_posts(request=request, uid=self.post.uid)
+        self.assertIn("Recomputed title", json.loads(response.content)["html"])
+
+    def test_tag_stats(self):
+        """
+        Test the tag statistics kept by the post signals
+        """
+        post = models.Post.objects.create(title="Tagged", author=self.owner, content="Test",
+                                          type=models.Post.QUESTION, tag_val="stat1,stat2")
+
+        stats = models.TagStats.objects.get(name="stat1")
+        self.assertEqual((stats.total, stats.answered), (1, 0))
+
+        models.Post.objects.create(title="Answer", author=self.owner, content="Test", parent=post,
+                                   type=models.Post.ANSWER)
+        stats.refresh_from_db()
+        self.assertEqual((stats.total, stats.answered), (1, 1))
+
+        # Removed tags are counted again.
+        post.tag_val = "stat1"
+        post.save()
+        self.assertEqual(models.TagStats.objects.get(name="stat2").total, 0)
+
+        # Comments do not recount the tags.
+        with patch('biostar.forum.auth.update_tag_stats') as recount:
+            models.Post.objects.create(title="Comment", author=self.owner, content="Test", parent=post,
+                                       type=models.Post.COMMENT)
+            self.assertFalse(recount.called)
+        stats.refresh_from_db()
+        self.assertEqual((stats.total, stats.answered, stats.commented), (1, 1, 1))
+
+        # Reconciling agrees with the counts.
+        tasks.batch_reconcile_tags()
+        stats.refresh_from_db()
+        self.assertEqual((stats.total, stats.answered, stats.commented), (1, 1, 1))
+
+        # The tags list reads the statistics.
+        url = reverse("tags_list")
+        request = fake_request(url=url, data={}, user=self.owner, method="GET")
+        response = views.tags_list(request=request)
+        self.assertContains(response, "stat1")
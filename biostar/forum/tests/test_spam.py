@@ -54,3 +54,28 @@ class TestSpam(TestCase):
         self.assertTrue(new_spam.is_spam, "Spam is classifier is not working")
 
         pass
+
+    def test_classify_batch(self):
+        """
+        Test the cached model and batch classification
+        """
+        import tempfile
+        from joblib import dump
+
+        spam = [f"buy cheap pills online now {r}" for r in range(10)]
+        ham = [f"how do I align reads with bowtie {r}" for r in range(10)]
+        nb = spamlib.fit_model(spam + ham, [1] * len(spam) + [0] * len(ham))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model = os.path.join(tmp, "spam.model")
+            dump(nb, model)
+
+            # The model is loaded once per process.
+            self.assertIs(spamlib.load_model(model), spamlib.load_model(model))
+
+            preds = spamlib.classify_batch(["buy cheap pills", "align reads with bowtie"], model=model)
+            self.assertEqual(list(preds), [1, 0])
+            self.assertEqual(spamlib.classify_content("buy cheap pills", model=model), 1)
+
+        # A missing model classifies nothing as spam.
+        self.assertEqual(spamlib.classify_batch(["buy cheap pills"], model=model), [0])
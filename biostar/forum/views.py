@@ -13,7 +13,6 @@ from django.db.models import Count, Q
 from django.http import Http404
 from django.shortcuts import render, redirect, reverse
 from django.views.decorators.csrf import ensure_csrf_cookie
-from taggit.models import Tag
 
 from biostar.accounts.models import Profile
 from biostar.forum import forms, auth, tasks, util, search, models, moderate
@@ -115,14 +114,85 @@ class CachedPaginator(Paginator):
         return value
 
 
+class KeysetPaginator(CachedPaginator):
+    """
+    Paginator that seeks past the row at the page boundary instead of skipping rows with an offset.
+    The cursor holds the sort value and the primary key of that row.
+    """
+
+    def __init__(self, order="-rank", after=None, before=None, *args, **kwargs):
+        self.order = order
+        self.after = after
+        self.before = before
+        super(KeysetPaginator, self).__init__(*args, **kwargs)
+
+    def encode(self, obj):
+        value = getattr(obj, self.order.lstrip("-"), None)
+        if value is None:
+            return ''
+        value = value.isoformat() if hasattr(value, "isoformat") else value
+        return f"{value}_{obj.pk}"
+
+    def decode(self, cursor):
+        try:
+            value, pk = cursor.rsplit("_", 1)
+            field = self.object_list.model._meta.get_field(self.order.lstrip("-"))
+            return field.to_python(value), int(pk)
+        except Exception as exc:
+            logger.debug(f"invalid cursor {cursor}: {exc}")
+            return None
+
+    def seek(self):
+        """
+        Returns the rows of the page next to the cursor, or None when there is no valid cursor.
+        """
+        forward = bool(self.after)
+        cursor = self.after or self.before
+        if not cursor or not self.object_list.query.can_filter():
+            return None
+
+        found = self.decode(cursor)
+        if not found:
+            return None
+
+        value, pk = found
+        field = self.order.lstrip("-")
+
+        # Moving forward on a descending order looks for smaller values.
+        oper = "lt" if self.order.startswith("-") == forward else "gt"
+        cond = Q(**{f"{field}__{oper}": value}) | Q(**{field: value, f"pk__{oper}": pk})
+        rows = self.object_list.filter(cond)
+
+        if forward:
+            return list(rows[:self.per_page])
+
+        # Moving backward reads the rows in reverse order.
+        rows = list(rows.reverse()[:self.per_page])
+        return rows[::-1]
+
+    def page(self, number):
+        page = super(KeysetPaginator, self).page(number)
+
+        # The seek costs the same on every page.
+        rows = self.seek()
+        page.object_list = list(page.object_list) if rows is None else rows
+
+        # Cursors for the links to the neighbouring pages.
+        if page.object_list:
+            page.previous_cursor = self.encode(page.object_list[0])
+            page.next_cursor = self.encode(page.object_list[-1])
+
+        return page
+
+
 def apply_sort(posts, limit=None, order=None):
 
-    # Apply post ordering.
+    # Apply post ordering, the primary key breaks the ties for the cursors.
     if ORDER_MAPPER.get(order):
         ordering = ORDER_MAPPER.get(order)
-        posts = posts.order_by(ordering)
+        posts = posts.order_by(ordering, "-pk")
     else:
-        posts = posts.order_by("-rank")
+        posts = posts.order_by("-rank", "-pk")
 
     days = LIMIT_MAP.get(limit, 0)
     # Apply time limit if required.
@@ -309,8 +379,10 @@ def post_list(request, topic=None, tag="", cutoff=None):
     if cutoff:
         posts = posts[:cutoff]
 
-    # Filter for any empty strings
-    paginator = CachedPaginator(cache_key=cache_key, object_list=posts, per_page=settings.POSTS_PER_PAGE)
+    # Seek to the page with the cursors when present.
+    ordering = ORDER_MAPPER.get(order) or "-rank"
+    paginator = KeysetPaginator(cache_key=cache_key, object_list=posts, per_page=settings.POSTS_PER_PAGE,
+                                order=ordering, after=request.GET.get("after"), before=request.GET.get("before"))
 
     # Apply the post paging.
     posts = paginator.get_page(page)
@@ -440,13 +512,12 @@ def tags_list(request):
     page = request.GET.get('page', 1)
     query = request.GET.get('query', '')
 
-    count = Count('post', filter=Q(post__is_toplevel=True))
-
     db_query = Q(name__icontains=query) if query else Q()
     cache_key = '' if query else TAGS_CACHE_KEY
 
-    tags = Tag.objects.annotate(nitems=count).filter(db_query)
-    tags = tags.order_by('-nitems')
+    # Tags with the most top level posts first.
+    tags = models.TagStats.objects.filter(db_query).filter(total__gt=0)
+    tags = tags.order_by('-total')
 
     # Create the paginator
     paginator = CachedPaginator(cache_key=cache_key,
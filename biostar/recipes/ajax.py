@@ -15,6 +15,7 @@ from biostar.recipes.const import *
 from biostar.recipes.models import Job, Analysis, Data, Project, MAX_TEXT_LEN, Access
 from biostar.recipes.forms import RecipeInterface
 from biostar.recipes import auth, util
+from biostar.recipes.decorators import read_access
 from django.shortcuts import render, redirect, reverse
 
 from biostar.recipes.forms import RecipeForm
@@ -99,12 +100,42 @@ def ajax_edit(request, id):
         return ajax_error(msg=message)
 
 
+def get_offset(request, name):
+    try:
+        return max(int(request.GET.get(name, 0)), 0)
+    except ValueError:
+        return 0
+
+
+def follow_log(path, offset):
+    """
+    Reads a log that follows the offset. A log shorter than the offset was truncated,
+    it is read again from the start and the client replaces the text it shows.
+    """
+    size = os.path.getsize(path) if os.path.isfile(path) else 0
+    reset = offset > size
+    text, offset = auth.read_log(path, offset=0 if reset else offset)
+    return text, offset, reset
+
+
+def job_logs(job, stdout_offset=0, stderr_offset=0):
+    """
+    The log output of a job that follows the offsets.
+    """
+    stdout_path = os.path.join(job.path, settings.JOB_STDOUT)
+    stderr_path = os.path.join(job.path, settings.JOB_STDERR)
+
+    stdout, stdout_offset, stdout_reset = follow_log(stdout_path, offset=stdout_offset)
+    stderr, stderr_offset, stderr_reset = follow_log(stderr_path, offset=stderr_offset)
+
+    return dict(stdout=stdout, stderr=stderr, stdout_offset=stdout_offset, stderr_offset=stderr_offset,
+                stdout_reset=stdout_reset, stderr_reset=stderr_reset)
+
+
 def check_job(request, uid):
     job = Job.objects.filter(uid=uid).first()
 
     check_back = 'check_back' if job.state in [Job.SPOOLED, Job.RUNNING] else ''
-    stdout_path = os.path.join(job.path, settings.JOB_STDOUT)
-    stderr_path = os.path.join(job.path, settings.JOB_STDERR)
 
     try:
         state_changed = int(request.GET.get('state')) != job.state
@@ -112,12 +143,12 @@ def check_job(request, uid):
         logger.error(f'Error checking job:{exc}')
         state_changed = False
 
-    if os.path.exists(stdout_path) and os.path.exists(stderr_path):
-        stdout = open(stdout_path, 'r').read()
-        stderr = open(stderr_path, 'r').read()
-        Job.objects.filter(uid=job.uid).update(stderr_log=stderr, stdout_log=stdout)
+    # Only the log output that follows the offsets is sent, when asked for.
+    if 'stdout_offset' in request.GET:
+        logs = job_logs(job, stdout_offset=get_offset(request, 'stdout_offset'),
+                        stderr_offset=get_offset(request, 'stderr_offset'))
     else:
-        stdout = stderr = None
+        logs = dict(stdout=None, stderr=None)
 
     # Render the updated image icon
     redir = job.url() if job.is_finished() else ""
@@ -132,8 +163,21 @@ def check_job(request, uid):
 
     return ajax_success(msg='success', redir=redir,
                         html=template, state=job.get_state_display(), is_running=job.is_running(),
-                        stdout=stdout, stderr=stderr, job_color=auth.job_color(job),
-                        state_changed=state_changed, img_tmpl=image_tmpl)
+                        job_color=auth.job_color(job), state_changed=state_changed, img_tmpl=image_tmpl, **logs)
+
+
+@read_access(type=Job)
+def job_log(request, uid):
+    """
+    Returns the log output written after the stdout_offset and stderr_offset byte offsets.
+    """
+    job = Job.objects.filter(uid=uid).first()
+
+    logs = job_logs(job, stdout_offset=get_offset(request, 'stdout_offset'),
+                    stderr_offset=get_offset(request, 'stderr_offset'))
+
+    return ajax_success(msg='success', state=job.get_state_display(), is_running=job.is_running(),
+                        is_finished=job.is_finished(), **logs)
 
 
 def check_size(fobj, maxsize=0.3):
@@ -21,6 +21,7 @@ from django.utils.timezone import now
 
 from biostar.recipes import models
 from biostar.recipes import util
+from biostar.recipes.listing import get_listing
 from biostar.recipes.const import *
 from biostar.recipes.models import Data, Analysis, Job, Project, Access
 
@@ -840,69 +841,11 @@ def delete_recipe(recipe, user):
         clone.project.set_counts()
 
 
-def transform(root, node, path):
-    # Image extension types.
-    IMAGE_EXT = {"png", "jpg", "gif", "jpeg"}
-
-    # Get the absolute path /root/node/path.
-    path = os.path.abspath(os.path.join(node, path))
-
-    # Find the relative path of the current node/path to the root.
-    relative = os.path.relpath(path, root)
-
-    # Follow symlinks and get the real path.
-    real = os.path.realpath(path)
-
-    # Get the parent directory
-    parent = os.path.dirname(path)
-
-    tstamp, size = 0, 0
-
-    if os.path.exists(path):
-        # Time stamp and size info.
-        tstamp = os.stat(path).st_mtime
-        size = os.stat(path).st_size
-
-    # Get the elements. i.e. foo/bar.txt -> ['foo', 'bar.txt']
-    elems = os.path.split(relative)
-    is_dir = os.path.isdir(path)
-
-    # Get all directories.
-    dirs = elems[:-1]
-    dirs = [] if dirs[0] == '' else dirs
-
-    # Get the last node.
-    last = elems[-1]
-    is_image = last.split(".")[-1] in IMAGE_EXT
-
-    return real, relative, dirs, last, tstamp, size, is_image, parent, is_dir
-
-
 def listing(root, node=None, show_all=True):
-    paths = []
-    node = node or root
-
-    try:
-        # Walk the root filesystem and collect all files.
-        if show_all:
-            for fpath, fdirs, fnames in os.walk(root, followlinks=True):
-                paths.extend([join(fpath, fname) for fname in fnames])
-        # Get the list of file in current directory node being traversed.
-        else:
-            paths = os.listdir(node)
-
-        # Add metadata to each path.
-        transformer = lambda path: transform(root=root, node=node, path=path)
-
-        paths = list(map(transformer, paths))
-
-        paths = sorted(paths, key=lambda x: x[0])
-
-    except Exception as exc:
-        paths = []
-        logger.error(exc)
-
-    return paths
+    """
+    Returns the files below root, or the files and directories in node when show_all is False.
+    """
+    return get_listing(root=root, node=node, show_all=show_all)
 
 
 def job_color(job):
@@ -916,6 +859,44 @@ def job_color(job):
     return
 
 
+def read_log(path, offset=0, limit=None):
+    """
+    Reads the bytes of a log file that follow the offset.
+    Returns the text and the offset to continue from.
+    """
+    limit = limit or settings.JOB_LOG_CHUNK
+
+    try:
+        with open(path, 'rb') as stream:
+            # The file may have been truncated since the last read.
+            size = os.fstat(stream.fileno()).st_size
+            offset = offset if 0 <= offset <= size else 0
+            stream.seek(offset)
+            data = stream.read(limit)
+    except OSError as exc:
+        logger.error(exc)
+        return "", offset
+
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # Leave a character split at the end of the chunk to the next read.
+        data = data[:exc.start] if exc.start >= len(data) - 3 else data
+        text = data.decode("utf-8", errors="replace")
+
+    return text, offset + len(data)
+
+
+def log_tail(path, limit=None):
+    """
+    Reads the end of a log file. Returns the text and the offset to continue from.
+    """
+    limit = limit or settings.JOB_LOG_CHUNK
+    size = os.path.getsize(path) if os.path.isfile(path) else 0
+    text, offset = read_log(path, offset=max(size - limit, 0), limit=limit)
+    return text, offset
+
+
 def guess_mimetype(fname):
     "Return mimetype for a known text filename"
 
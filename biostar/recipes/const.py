@@ -27,6 +27,9 @@ STOPWORDS = (
     'what,when,where,which,while,who,whom,why,will,with,'
     'would,yet,you,your').split(',')
 
+# Files and directories modified this recently (nanoseconds) may change again without a new modification time.
+RACY_NS = 2 * 10 ** 9
+
 REDIRECT_FIELD_NAME = 'next'
 
 COPIED_DATA = "data"
@@ -0,0 +1,171 @@
+"""
+Runs the queued jobs in a pool of worker threads.
+
+The recipes run as separate processes, the threads only wait on them.
+A job is claimed with a conditional update, so several executors may share a database.
+The claim time is kept in the start date, jobs claimed by an executor that stopped before running them
+are queued again.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import toml as hjson
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from biostar.recipes.models import Job
+
+logger = logging.getLogger("engine")
+
+
+def requirements(job):
+    """
+    Returns the cpus and the memory (GB) declared in the settings.execute section of a job.
+    """
+    try:
+        execute = hjson.loads(job.json_text).get("settings", {}).get("execute", {})
+        cpus = int(execute.get("cpus", 1))
+        memory = float(execute.get("memory", 0))
+    except Exception as exc:
+        logger.warning(f"job id={job.id} invalid requirements: {exc}")
+        cpus, memory = 1, 0
+
+    return max(cpus, 1), max(memory, 0)
+
+
+def claim(job):
+    """
+    Moves a queued job into the spooled state. Only one executor succeeds.
+    """
+    return Job.objects.filter(pk=job.pk, state=Job.QUEUED).update(state=Job.SPOOLED, start_date=timezone.now()) == 1
+
+
+def requeue():
+    """
+    Queues again the jobs that stayed in the spooled state longer than EXECUTOR_CLAIM_TIMEOUT seconds.
+    Returns the number of jobs queued.
+    """
+    limit = timezone.now() - timedelta(seconds=settings.EXECUTOR_CLAIM_TIMEOUT)
+    stale = Job.objects.filter(state=Job.SPOOLED, start_date__lt=limit)
+    count = stale.update(state=Job.QUEUED, start_date=None)
+    if count:
+        logger.warning(f"requeued {count} stale jobs")
+    return count
+
+
+class Executor:
+    """
+    Starts queued jobs while worker, cpu and memory slots are free.
+    """
+
+    def __init__(self, workers, cpus, memory=0, user_jobs=1):
+        self.workers = workers
+        self.cpus = cpus
+        # No memory limit when zero.
+        self.memory = memory
+        self.user_jobs = user_jobs
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        # Set when a job finishes, wakes up the scheduling loop.
+        self.wake = threading.Event()
+        # The slots held by the running jobs, keyed by job id.
+        self.active = {}
+
+    def slots(self, cpus, memory):
+        """
+        The slots taken by a job, a job asking for more than the capacity runs alone.
+        """
+        cpus = min(cpus, self.cpus)
+        memory = min(memory, self.memory) if self.memory else 0
+        return cpus, memory
+
+    def fits(self, cpus, memory):
+        used_cpus = sum(slot[0] for slot in self.active.values())
+        used_memory = sum(slot[1] for slot in self.active.values())
+
+        if len(self.active) >= self.workers:
+            return False
+
+        if used_cpus + cpus > self.cpus:
+            return False
+
+        return not self.memory or used_memory + memory <= self.memory
+
+    def schedule(self):
+        """
+        Claims and starts the queued jobs that fit. Returns the number of jobs started.
+        """
+        with self.lock:
+            if len(self.active) >= self.workers:
+                return 0
+
+        # Claims left behind by a stopped executor count against the user limits.
+        requeue()
+
+        queued = Job.objects.filter(state=Job.QUEUED, deleted=False).order_by("id")[:settings.EXECUTOR_BATCH]
+
+        # Jobs of each user started by any of the executors.
+        rows = Job.objects.filter(state__in=[Job.SPOOLED, Job.RUNNING]).values("owner_id").annotate(count=Count("id"))
+        running = {row["owner_id"]: row["count"] for row in rows}
+
+        started = 0
+        for job in queued:
+
+            # The user is at the limit, the job stays in the queue.
+            if running.get(job.owner_id, 0) >= self.user_jobs:
+                continue
+
+            cpus, memory = self.slots(*requirements(job))
+
+            with self.lock:
+                # Smaller jobs further in the queue may still fit.
+                if not self.fits(cpus, memory):
+                    continue
+
+                # Another executor started the job.
+                if not claim(job):
+                    continue
+
+                self.active[job.id] = (cpus, memory)
+
+            running[job.owner_id] = running.get(job.owner_id, 0) + 1
+            logger.info(f"job id={job.id} started, cpus={cpus} memory={memory}")
+            self.pool.submit(self.execute, job.id)
+            started += 1
+
+        return started
+
+    def execute(self, job_id):
+        from biostar.recipes.management.commands.job import run
+
+        # Jobs may run for hours, the connection of the thread may be closed by the database meanwhile.
+        close_old_connections()
+        try:
+            job = Job.objects.filter(pk=job_id).first()
+            run(job)
+        except Exception as exc:
+            logger.error(f"job id={job_id} error {exc}")
+            Job.objects.filter(pk=job_id).update(state=Job.ERROR)
+        finally:
+            close_old_connections()
+            with self.lock:
+                self.active.pop(job_id, None)
+            self.wake.set()
+
+    def serve(self, poll):
+        """
+        Schedules jobs until interrupted, waiting at most poll seconds between rounds.
+        """
+        logger.info(f"executor workers={self.workers} cpus={self.cpus} memory={self.memory}")
+        try:
+            while True:
+                self.schedule()
+                self.wake.wait(timeout=poll)
+                self.wake.clear()
+        finally:
+            # Running jobs are allowed to finish.
+            self.pool.shutdown(wait=True)
@@ -0,0 +1,129 @@
+"""
+Lists the files of data, job and import directories.
+
+A listing is made in a single scandir pass and is cached together with the modification times
+of the directories it visited. The cached listing is used while none of these directories change.
+The views show one sorted page of a listing at a time.
+"""
+import hashlib
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+
+from biostar.recipes.const import RACY_NS
+
+logger = logging.getLogger("engine")
+
+# Image extension types.
+IMAGE_EXT = {"png", "jpg", "gif", "jpeg"}
+
+# The sort orders of a listing, a leading minus sign reverses them.
+SORT_KEYS = {
+    "name": lambda item: item[1],
+    "date": lambda item: item[4],
+    "size": lambda item: item[5],
+}
+
+
+def make_entry(root, path, real, entry):
+    """
+    The fields of a path, as shown in the file list templates.
+    """
+    # Find the relative path of the current node/path to the root.
+    relative = os.path.relpath(path, root)
+
+    try:
+        stat = entry.stat()
+        tstamp, size = stat.st_mtime, stat.st_size
+    except OSError:
+        tstamp, size = 0, 0
+
+    # Get the elements. i.e. foo/bar.txt -> ['foo', 'bar.txt']
+    elems = os.path.split(relative)
+
+    # Get all directories.
+    dirs = elems[:-1]
+    dirs = [] if dirs[0] == '' else dirs
+
+    # Get the last node.
+    last = elems[-1]
+    is_image = last.split(".")[-1] in IMAGE_EXT
+
+    return real, relative, dirs, last, tstamp, size, is_image, os.path.dirname(path), entry.is_dir()
+
+
+def walk(root, location, real_dir, recursive, paths, mtimes):
+    """
+    Collects the entries of a directory, and of its subdirectories when recursive.
+    """
+    mtimes[location] = os.stat(location).st_mtime_ns
+
+    for entry in os.scandir(location):
+        path = os.path.join(location, entry.name)
+
+        # Only symbolic links need resolving, other paths follow the real path of their directory.
+        real = os.path.realpath(path) if entry.is_symlink() else os.path.join(real_dir, entry.name)
+
+        if recursive and entry.is_dir():
+            walk(root, location=path, real_dir=real, recursive=recursive, paths=paths, mtimes=mtimes)
+        else:
+            paths.append(make_entry(root=root, path=path, real=real, entry=entry))
+
+
+def is_current(mtimes):
+    """
+    True when none of the directories changed.
+    """
+    try:
+        return all(os.stat(location).st_mtime_ns == mtime for location, mtime in mtimes.items())
+    except OSError:
+        return False
+
+
+def get_listing(root, node=None, show_all=True, use_cache=True):
+    """
+    Returns the files below root, or the files and directories in node when show_all is False.
+    """
+    root = os.path.abspath(root)
+    node = os.path.abspath(node or root)
+
+    key = f"listing-{hashlib.md5(f'{root}:{node}:{show_all}'.encode('utf-8')).hexdigest()}"
+
+    found = cache.get(key) if use_cache else None
+    if found and is_current(found[0]):
+        return found[1]
+
+    paths, mtimes = [], {}
+    started = time.time_ns()
+    try:
+        walk(root, location=node, real_dir=os.path.realpath(node), recursive=show_all, paths=paths, mtimes=mtimes)
+    except OSError as exc:
+        logger.error(exc)
+        return []
+
+    paths.sort(key=lambda item: item[0])
+
+    # The listing is kept only when no directory changed shortly before the scan.
+    racy = any(mtime > started - RACY_NS for mtime in mtimes.values())
+
+    if use_cache and not racy:
+        cache.set(key, (mtimes, paths), timeout=settings.LISTING_CACHE_TIMEOUT)
+
+    return paths
+
+
+def get_page(paths, sort="name", page=1):
+    """
+    Returns a page of the listing in the given order.
+    """
+    name = sort.lstrip("-")
+    if name in SORT_KEYS:
+        paths = sorted(paths, key=SORT_KEYS[name], reverse=sort.startswith("-"))
+
+    paginator = Paginator(paths, per_page=settings.LISTING_PER_PAGE)
+
+    return paginator.get_page(page)
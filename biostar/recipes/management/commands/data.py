@@ -49,7 +49,7 @@ class Command(BaseCommand):
         # Work with existing data.
         if data:
             if update_toc:
-                data.make_toc()
+                data.make_toc(full=True)
                 print(f"*** Data id : {did} table of contents updated.")
             return
 
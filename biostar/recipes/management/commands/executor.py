@@ -0,0 +1,31 @@
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from biostar.recipes.executor import Executor
+
+logger = logging.getLogger('engine')
+
+
+class Command(BaseCommand):
+    help = 'Runs the queued jobs in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.EXECUTOR_WORKERS,
+                            help="Jobs running at the same time.")
+        parser.add_argument('--cpus', type=int, default=settings.EXECUTOR_CPUS,
+                            help="Cpus shared by the running jobs.")
+        parser.add_argument('--memory', type=float, default=settings.EXECUTOR_MEMORY,
+                            help="Memory (GB) shared by the running jobs, zero for no limit.")
+        parser.add_argument('--user_jobs', type=int, default=settings.EXECUTOR_USER_JOBS,
+                            help="Jobs a user may have running at the same time.")
+        parser.add_argument('--poll', type=float, default=settings.EXECUTOR_POLL,
+                            help="Longest wait between two looks at the queue (seconds).")
+
+    def handle(self, *args, **options):
+
+        executor = Executor(workers=options['workers'], cpus=options['cpus'], memory=options['memory'],
+                            user_jobs=options['user_jobs'])
+        try:
+            executor.serve(poll=options['poll'])
+        except KeyboardInterrupt:
+            logger.info("executor stopped")
@@ -8,7 +8,7 @@ from django.template import Template, Context
 from django.utils.encoding import force_text
 
 from biostar.recipes.models import Job
-from biostar.recipes import auth
+from biostar.recipes import auth, results
 from django.conf import settings
 from django.utils import timezone
 from biostar.emailer.tasks import send_email
@@ -206,20 +206,30 @@ def run(job, options={}):
         Job.objects.filter(pk=job.pk).update(state=Job.RUNNING,
                                              start_date=timezone.now(),
                                              script=script)
-        # Run the command.
-        proc = subprocess.run(command, cwd=work_dir, shell=True,
-                              stdout=open(stdout_fname, "w"),
-                              stderr=open(stderr_fname, "w"))
 
-        # Raise an error if returncode is anything but 0.
-        proc.check_returncode()
+        # Overridden inputs are not reused.
+        digest = "" if (use_template or use_json) else results.get_digest(job)
+        source = results.find_result(job=job, digest=digest) if digest else None
+
+        if source:
+            # Reuse the results of an identical earlier run.
+            logger.info(f'Job id={job.id} reuses the results of job id={source.id}')
+            results.materialize(source=source, job=job)
+        else:
+            # Run the command.
+            proc = subprocess.run(command, cwd=work_dir, shell=True,
+                                  stdout=open(stdout_fname, "w"),
+                                  stderr=open(stderr_fname, "w"))
+
+            # Raise an error if returncode is anything but 0.
+            proc.check_returncode()
 
         # Perform tasks at job finalization
         finalize_job(data=json_data, job=job)
 
         # If we made it this far the job has finished.
         logger.info(f"uid={job.uid}, name={job.name}")
-        Job.objects.filter(pk=job.pk).update(state=Job.COMPLETED)
+        Job.objects.filter(pk=job.pk).update(state=Job.COMPLETED, digest=digest)
 
     except Exception as exc:
         # Write error to log file
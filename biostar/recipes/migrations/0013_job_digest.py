@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='digest',
+            field=models.CharField(db_index=True, default='', max_length=64),
+        ),
+    ]
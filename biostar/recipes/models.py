@@ -12,7 +12,7 @@ from django.urls import reverse
 from django.utils import timezone
 from django.conf import settings
 from biostar.accounts.models import User
-from . import util
+from . import util, toclib
 from .const import *
 
 logger = logging.getLogger("engine")
@@ -412,27 +412,17 @@ class Data(models.Model):
     def get_path(self):
         return self.toc
 
-    def make_toc(self):
-
+    def make_toc(self, full=False):
+        """
+        Writes the table of contents, only the directories that changed are listed again.
+        """
         tocname = self.get_path()
 
-        collect = util.findfiles(self.get_data_dir(), collect=[])
-
-        # Create a sorted file path collection.
-        collect.sort()
-        # Write the table of contents.
-        with open(tocname, 'w') as fp:
-            fp.write("\n".join(collect))
-
-        # Find the cumulative size of the files.
-        size = 0
-        for elem in collect:
-            if os.path.isfile(elem):
-                size += os.stat(elem, follow_symlinks=True).st_size
+        count, size = toclib.build(self.get_data_dir(), tocname=tocname, full=full)
 
         self.size = size
         self.file = tocname
-        self.file_count = len(collect)
+        self.file_count = count
         Data.objects.filter(id=self.id).update(size=self.size, file=self.file, file_count=self.file_count)
 
         return tocname
@@ -725,6 +715,9 @@ class Job(models.Model):
     # This will be set when the job attempts to run.
     script = models.TextField(default="")
 
+    # Digest of the inputs of a completed job, identical runs may reuse its results.
+    digest = models.CharField(max_length=64, default="", db_index=True)
+
     # Keeps track of errors.
     stdout_log = models.TextField(default="", max_length=MAX_LOG_LEN)
 
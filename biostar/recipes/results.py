@@ -0,0 +1,125 @@
+"""
+Reuses the results of an earlier job that ran the same recipe on the same inputs.
+
+Recipes opt in with:
+
+    [settings.execute]
+    cache = true
+
+The digest covers the template, the parameters and the size and modification time
+of every file listed in the table of contents of the input data. A file modified just before
+the digest is made may change again without a new modification time, its content is hashed instead.
+
+The reused outputs are copies, later runs of either job do not change the other.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.db.models import Q
+
+from biostar.recipes.const import UPLOAD, RACY_NS
+from biostar.recipes.models import Job
+
+logger = logging.getLogger("engine")
+
+
+def fingerprint(path, started):
+    try:
+        stat = os.stat(path)
+        if stat.st_mtime_ns <= started - RACY_NS:
+            return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        return f"{path}:{hasher.hexdigest()}"
+    except OSError:
+        return f"{path}:missing"
+
+
+def get_digest(job):
+    """
+    Returns the digest of the job inputs, empty when the results may not be reused.
+    """
+    json_data = job.json_data
+
+    if not json_data.get("settings", {}).get("execute", {}).get("cache"):
+        return ""
+
+    params = {key: value for key, value in json_data.items() if isinstance(value, dict)}
+
+    started = time.time_ns()
+    hasher = hashlib.sha256()
+    hasher.update(job.template.encode("utf-8"))
+    hasher.update(json.dumps(json_data, sort_keys=True, default=str).encode("utf-8"))
+
+    for name, item in sorted(params.items()):
+
+        # Uploaded files are stored in the directory of each job.
+        if item.get("display") == UPLOAD and item.get("value"):
+            return ""
+
+        # Data inputs are covered by the files in their table of contents.
+        toc = item.get("toc")
+        if not toc:
+            continue
+        try:
+            files = [line.strip() for line in open(toc, 'rt')]
+        except OSError:
+            return ""
+        for path in files:
+            hasher.update(fingerprint(path, started=started).encode("utf-8"))
+
+    return hasher.hexdigest()
+
+
+def find_result(job, digest):
+    """
+    The most recent completed job with the same digest that still has its directory.
+    Only the jobs of the same project or of the same owner are considered.
+    """
+    jobs = Job.objects.filter(digest=digest, state=Job.COMPLETED, deleted=False).exclude(pk=job.pk)
+    jobs = jobs.filter(Q(project=job.project) | Q(owner=job.owner))
+    for source in jobs.order_by("-pk")[:5]:
+        if os.path.isdir(source.path):
+            return source
+    return None
+
+
+def materialize(source, job):
+    """
+    Copies the files of the source job into the directory of the job.
+    Symbolic links are recreated. Files already present are kept, except the logs.
+    """
+    logs = {settings.JOB_STDOUT, settings.JOB_STDERR}
+
+    for dirpath, dirnames, fnames in os.walk(source.path):
+        relpath = os.path.relpath(dirpath, source.path)
+        target_dir = os.path.normpath(os.path.join(job.path, relpath))
+        os.makedirs(target_dir, exist_ok=True)
+
+        # Linked directories are recreated as links and not walked into.
+        links = [name for name in dirnames if os.path.islink(os.path.join(dirpath, name))]
+        dirnames[:] = [name for name in dirnames if name not in links]
+
+        for fname in fnames + links:
+            src = os.path.join(dirpath, fname)
+            dest = os.path.join(target_dir, fname)
+            is_log = os.path.relpath(dest, job.path) in logs
+            if os.path.lexists(dest):
+                if not is_log:
+                    continue
+                os.remove(dest)
+
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dest)
+                continue
+
+            # A rerun in the same directory rewrites the outputs, a shared inode would change the source.
+            shutil.copy2(src, dest)
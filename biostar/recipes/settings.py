@@ -30,6 +30,12 @@ PAGEDOWN_IMAGE_UPLOAD_ENABLED = True
 # Amount of objects shown per page.
 PER_PAGE = 50
 
+# Amount of files shown per page in the data and job views.
+LISTING_PER_PAGE = 100
+
+# How long a directory listing is kept in the cache (seconds).
+LISTING_CACHE_TIMEOUT = 3600
+
 # Upload path for pagedown images, relative to media root.
 PAGEDOWN_IMAGE_UPLOAD_PATH = "images"
 
@@ -37,6 +43,9 @@ PAGEDOWN_IMAGE_UPLOAD_PATH = "images"
 JOB_STDOUT = os.path.join(JOB_LOGDIR, 'stdout.txt')
 JOB_STDERR = os.path.join(JOB_LOGDIR, 'stderr.txt')
 
+# Most bytes of a job log sent in a single response.
+JOB_LOG_CHUNK = 256 * 1024
+
 # Maximum count of data allowed fo users
 MAX_DATA_USERS = 100
 
@@ -52,6 +61,28 @@ CLIPBOARD_NAME = "clipboard"
 # Maximum amount of total running jobs allowed for non-staff user.
 MAX_RUNNING_JOBS = 5
 
+# Queued jobs are run by the executor command instead of the spooler.
+JOB_EXECUTOR = False
+
+# Jobs the executor runs at the same time.
+EXECUTOR_WORKERS = 4
+
+# Cpus and memory (GB) shared by the running jobs, no memory limit when zero.
+EXECUTOR_CPUS = os.cpu_count() or 1
+EXECUTOR_MEMORY = 0
+
+# Jobs a single user may have running at the same time.
+EXECUTOR_USER_JOBS = 2
+
+# Longest wait between two looks at the queue (seconds).
+EXECUTOR_POLL = 0.5
+
+# Queued jobs inspected in one scheduling round.
+EXECUTOR_BATCH = 100
+
+# Jobs claimed longer ago than this (seconds) without starting are queued again.
+EXECUTOR_CLAIM_TIMEOUT = 600
+
 # Maximum amount of cumulative uploaded files a user is allowed, in mega-bytes.
 MAX_UPLOAD_SIZE = 10
 
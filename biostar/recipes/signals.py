@@ -7,7 +7,7 @@ from django.conf import settings
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from biostar.recipes.models import Project, Access, Analysis, Job, Data
-from biostar.recipes import util, auth
+from biostar.recipes import util, auth, toclib
 
 logger = logging.getLogger("engine")
 
@@ -197,4 +197,6 @@ def finalize_data(sender, instance, created, raw, update_fields, **kwargs):
         # Update the dir, toc, and uid.
         Data.objects.filter(id=instance.id).update(uid=instance.uid, dir=instance.dir, toc=instance.toc)
 
-    instance.make_toc()
+    # Saves that only change the metadata leave the data directory as it was.
+    if created or toclib.is_stale(instance.get_data_dir(), instance.get_path()):
+        instance.make_toc()
@@ -17,10 +17,22 @@ function change_state(job, data) {
         job.transition('pulse');
 
     }
-    // Update the image, stdout, and stderr.
+    // Update the image.
     image.replaceWith(data.img_tmpl);
-    stdout.text(data.stdout);
-    stderr.text(data.stderr);
+
+    // Append the new log output, a truncated log replaces the shown text.
+    if (data.stdout !== null && data.stdout !== undefined) {
+        if (data.stdout_reset) {
+            stdout.empty();
+        }
+        if (data.stderr_reset) {
+            stderr.empty();
+        }
+        stdout.append(document.createTextNode(data.stdout));
+        stderr.append(document.createTextNode(data.stderr));
+        stdout.data('offset', data.stdout_offset);
+        stderr.data('offset', data.stderr_offset);
+    }
 
 }
 
@@ -62,10 +74,18 @@ function check_jobs() {
             return
         }
 
+        // Ask only for the log output not yet shown.
+        var params = {'state': state};
+        var stdout = $('#stdout pre:first');
+        if (stdout.length) {
+            params['stdout_offset'] = stdout.data('offset') || 0;
+            params['stderr_offset'] = $('#stderr').data('offset') || 0;
+        }
+
         $.ajax('/ajax/check/job/{0}/'.format(uid), {
             type: 'GET',
             dataType: 'json',
-            data: {'state': state},
+            data: params,
             ContentType: 'application/json',
             success: function (data) {
 
@@ -35,7 +35,13 @@ def send_emails(*args ,**kwargs):
 
 @timer(30)
 def scheduler(*args, **kwargs):
+    from django.conf import settings
     from biostar.recipes.models import Job
+
+    # The executor command runs the queued jobs.
+    if settings.JOB_EXECUTOR:
+        return
+
     # Check for queued jobs.
     jobs = Job.objects.filter(state=Job.QUEUED)
     if jobs:
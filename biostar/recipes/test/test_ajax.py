@@ -68,6 +68,51 @@ class AjaxTest(TestCase):
         json_response = ajax.check_job(request=request, uid=self.job.uid)
         self.process_response(json_response)
 
+    def test_job_log(self):
+        """
+        Test reading the job logs from byte offsets
+        """
+        stdout_path = os.path.join(self.job.path, settings.JOB_STDOUT)
+        os.makedirs(os.path.dirname(stdout_path), exist_ok=True)
+        with open(stdout_path, 'wt') as fp:
+            fp.write("first line\n")
+
+        url = reverse('ajax_job_log', kwargs=dict(uid=self.job.uid))
+
+        def get_log(**data):
+            request = fake_request(url=url, data=data, user=self.owner, method='GET')
+            response = ajax.job_log(request=request, uid=self.job.uid)
+            return json.loads(response.content)
+
+        data = get_log()
+        self.assertEqual(data['stdout'], "first line\n")
+        self.assertEqual(data['stderr'], "")
+
+        # Only the new output is returned.
+        with open(stdout_path, 'at') as fp:
+            fp.write("second line\n")
+
+        data = get_log(stdout_offset=data['stdout_offset'])
+        self.assertEqual(data['stdout'], "second line\n")
+        self.assertEqual(data['stdout_offset'], os.path.getsize(stdout_path))
+        self.assertFalse(data['stdout_reset'])
+
+        # A truncated log is sent again from the start.
+        offset = data['stdout_offset']
+        with open(stdout_path, 'wt') as fp:
+            fp.write("new\n")
+
+        data = get_log(stdout_offset=offset)
+        self.assertEqual(data['stdout'], "new\n")
+        self.assertTrue(data['stdout_reset'])
+
+        # A character split at the end of a chunk waits for the next read.
+        with open(stdout_path, 'wb') as fp:
+            fp.write("ab\u00e9".encode("utf-8"))
+        text, offset = auth.read_log(stdout_path, offset=0, limit=3)
+        self.assertEqual((text, offset), ("ab", 2))
+        self.assertEqual(auth.read_log(stdout_path, offset=offset), ("\u00e9", 4))
+
     def test_copy_file(self):
         """
         Test AJAX function used to copy file
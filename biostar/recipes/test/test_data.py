@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 from unittest.mock import patch, MagicMock
 
 from django.conf import settings
@@ -89,6 +90,123 @@ class DataViewTest(TestCase):
 
         self.assertTrue(os.path.exists(data.get_data_dir()), "Directory not being linked")
 
+    def test_data_toc(self):
+        "Test updating the table of contents of a data directory"
+        import shutil
+        from biostar.recipes import toclib
+
+        # Data directories of earlier runs link to this location.
+        source = os.path.join(TEST_ROOT, "toc-source")
+        shutil.rmtree(source, ignore_errors=True)
+
+        os.makedirs(os.path.join(source, "sub"))
+        open(os.path.join(source, "sub", "first.txt"), 'wt').write("abc")
+        open(os.path.join(source, "second.txt"), 'wt').write("abcde")
+
+        data = auth.create_data(project=self.project, path=source)
+        data = models.Data.objects.get(pk=data.pk)
+        count, size = data.file_count, data.size
+        self.assertTrue(count >= 2 and size >= 8)
+
+        # Directories modified just before a build are listed again by the next one.
+        self.assertEqual(toclib.load_state(data.get_path())[os.path.join(data.get_data_dir(), "sub")][0], 0)
+        past = time.time() - 60
+        for location, dirs, fnames in os.walk(data.get_data_dir(), followlinks=True):
+            os.utime(location, (past, past))
+        data.make_toc()
+
+        # A file added below the data directory.
+        open(os.path.join(source, "sub", "third.txt"), 'wt').write("ab")
+
+        # Saving the metadata does not look at the files.
+        with patch('biostar.recipes.toclib.scan') as scan:
+            data.name = "renamed"
+            data.save()
+            self.assertFalse(scan.called)
+
+        # Only the changed directory is listed again.
+        old = toclib.load_state(data.get_path())
+        self.assertEqual(toclib.scan(data.get_data_dir(), old=old, new={}), 1)
+
+        data.make_toc()
+        data = models.Data.objects.get(pk=data.pk)
+        self.assertEqual((data.file_count, data.size), (count + 1, size + 2))
+        self.assertEqual(len(data.get_files()), count + 1)
+
+    def test_data_toc_racy(self):
+        "Test that a directory changed within the same clock tick as the build is listed again"
+        import tempfile
+        from biostar.recipes import toclib
+
+        with tempfile.TemporaryDirectory() as root:
+            tocname = os.path.join(root, "toc.txt")
+            location = os.path.join(root, "data")
+            os.makedirs(location)
+            toclib.build(location, tocname)
+
+            # A file linked without changing the modification time of the directory.
+            mtime = os.stat(location).st_mtime_ns
+            open(os.path.join(location, "linked.txt"), 'wt').write("abc")
+            os.utime(location, ns=(mtime, mtime))
+
+            self.assertTrue(toclib.is_stale(location, tocname))
+            self.assertEqual(toclib.build(location, tocname), (1, 3))
+
+    @override_settings(LISTING_PER_PAGE=2)
+    def test_data_listing(self):
+        "Test the cached and paginated listing of a data directory"
+        import shutil
+        from biostar.recipes import listing
+
+        source = os.path.join(TEST_ROOT, "listing-source")
+        shutil.rmtree(source, ignore_errors=True)
+
+        os.makedirs(os.path.join(source, "listing"))
+        open(os.path.join(source, "listing", "first.txt"), 'wt').write("abc")
+        open(os.path.join(source, "second.txt"), 'wt').write("abcde")
+
+        data = auth.create_data(project=self.project, path=source)
+        root = data.get_data_dir()
+
+        # Recently modified directories are not cached.
+        past = time.time() - 60
+        for location in (root, source, os.path.join(source, "listing")):
+            os.utime(location, (past, past))
+
+        paths = listing.get_listing(root)
+        names = [item[3] for item in paths]
+        self.assertTrue({"first.txt", "second.txt"}.issubset(names))
+
+        # Unchanged directories are not listed again.
+        with patch('biostar.recipes.listing.walk') as walk:
+            self.assertEqual(listing.get_listing(root), paths)
+            self.assertFalse(walk.called)
+
+        # A file added to a directory is found.
+        open(os.path.join(source, "listing", "third.txt"), 'wt').write("ab")
+        self.assertEqual(len(listing.get_listing(root)), len(paths) + 1)
+
+        page = listing.get_page(listing.get_listing(root), sort="-size", page=1)
+        self.assertEqual(len(page), 2)
+        self.assertEqual(page[0][5], max(item[5] for item in paths))
+
+        # A directory is listed one level deep.
+        url = reverse('data_view', kwargs=dict(uid=data.uid))
+        request = fake_request(url=url, data={"dir": "listing", "sort": "name"}, user=self.owner, method="GET")
+        response = views.data_view(request=request, uid=data.uid)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('data_serve', kwargs=dict(uid=data.uid, path="listing/third.txt")))
+        self.assertNotContains(response, reverse('data_serve', kwargs=dict(uid=data.uid, path="second.txt")))
+
+        # Directories outside of the root fall back to the root listing.
+        outside = os.path.join("..", os.path.basename(root) + "0")
+        os.makedirs(os.path.join(os.path.dirname(root), os.path.basename(root) + "0"), exist_ok=True)
+        for folder in ("../..", outside, "/etc"):
+            request = fake_request(url=url, data={"dir": folder}, user=self.owner, method="GET")
+            paths, found, sort = views.file_page(request, root=root)
+            self.assertEqual(found, "")
+            self.assertEqual(paths.paginator.count, len(listing.get_listing(root)))
+
     def test_data_copy_paste(self):
         "Test data copy and paste interface"
 
@@ -4,7 +4,7 @@ from unittest.mock import patch, MagicMock
 from django.core import management
 from django.urls import reverse
 from django.conf import settings
-from biostar.recipes import auth, const
+from biostar.recipes import auth, const, results
 from biostar.recipes import models, views
 
 from biostar.utils.helpers import fake_request, get_uuid
@@ -47,6 +47,103 @@ class JobViewTest(TestCase):
         self.job.save()
         #scheduler
 
+    def test_executor(self):
+        """
+        Test claiming queued jobs within the user and resource limits.
+        """
+        from datetime import timedelta
+        from django.utils import timezone
+        from biostar.recipes.executor import Executor, requirements, requeue
+
+        models.Job.objects.update(state=models.Job.COMPLETED)
+
+        big = auth.create_analysis(project=self.project, json_text="[settings.execute]\ncpus = 3",
+                                   template="", security=models.Analysis.AUTHORIZED)
+        jobs = [auth.create_job(analysis=big, user=self.owner)]
+        jobs += [auth.create_job(analysis=self.recipe, user=self.owner) for step in range(3)]
+        models.Job.objects.filter(pk__in=[job.pk for job in jobs]).update(state=models.Job.QUEUED)
+
+        self.assertEqual(requirements(jobs[0]), (3, 0))
+
+        executor = Executor(workers=4, cpus=4, user_jobs=2)
+        executor.pool = MagicMock()
+
+        # The large job takes three cpus, one more job fits.
+        self.assertEqual(executor.schedule(), 2)
+        states = [models.Job.objects.get(pk=job.pk).state for job in jobs]
+        self.assertEqual(states.count(models.Job.SPOOLED), 2)
+
+        # The user limit is reached.
+        executor.active.clear()
+        self.assertEqual(executor.schedule(), 0)
+
+        # Claims of a stopped executor are queued again.
+        past = timezone.now() - timedelta(seconds=settings.EXECUTOR_CLAIM_TIMEOUT + 1)
+        models.Job.objects.filter(state=models.Job.SPOOLED).update(start_date=past)
+        self.assertEqual(requeue(), 2)
+        self.assertEqual(executor.schedule(), 2)
+
+    def test_job_results(self):
+        """
+        Test reusing the results of an identical job
+        """
+        recipe = auth.create_analysis(project=self.project, json_text="[settings.execute]\ncache = true",
+                                      template="echo $RANDOM > out.txt; mkdir -p data; ln -sfn data linked", security=models.Analysis.AUTHORIZED)
+
+        import shutil
+
+        def create_job():
+            # Job directories of earlier test runs are reused.
+            job = auth.create_job(analysis=recipe, user=self.owner)
+            shutil.rmtree(job.path, ignore_errors=True)
+            os.makedirs(job.path)
+            return job
+
+        first = create_job()
+        management.call_command('job', id=first.id)
+        first = models.Job.objects.get(pk=first.pk)
+        self.assertEqual(first.state, models.Job.COMPLETED)
+        self.assertTrue(first.digest)
+
+        second = create_job()
+        management.call_command('job', id=second.id)
+        second = models.Job.objects.get(pk=second.pk)
+        self.assertEqual(second.state, models.Job.COMPLETED)
+        self.assertEqual(second.digest, first.digest)
+
+        # The output is a copy of the first job's output.
+        source, target = os.path.join(first.path, "out.txt"), os.path.join(second.path, "out.txt")
+        self.assertEqual(open(source).read(), open(target).read())
+        self.assertFalse(os.path.samefile(source, target))
+
+        # Symbolic links are recreated.
+        self.assertEqual(os.readlink(os.path.join(second.path, "linked")), "data")
+
+        # Jobs of other owners and projects are not reused.
+        user = models.User.objects.create(username=f"other{get_uuid(4)}", email=f"other{get_uuid(4)}@l.com")
+        other = auth.create_project(user=user, name="other")
+        copy = auth.create_analysis(project=other, json_text=recipe.json_text, template=recipe.template,
+                                    security=models.Analysis.AUTHORIZED)
+        third = auth.create_job(analysis=copy, user=user)
+        self.assertEqual(results.get_digest(third), first.digest)
+        self.assertIsNone(results.find_result(job=third, digest=first.digest))
+
+        # A file rewritten within the same modification time is told apart by its content.
+        import tempfile, time
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "input.txt")
+            open(path, 'wt').write("abc")
+            mtime = os.stat(path).st_mtime_ns
+            started = time.time_ns()
+            before = results.fingerprint(path, started=started)
+            open(path, 'wt').write("xyz")
+            os.utime(path, ns=(mtime, mtime))
+            self.assertNotEqual(results.fingerprint(path, started=started), before)
+
+        # Recipes that do not opt in always run.
+        management.call_command('job', id=self.job.id)
+        self.assertEqual(models.Job.objects.get(pk=self.job.pk).digest, "")
+
     @patch('biostar.recipes.models.Job.save', MagicMock(name="save"))
     def test_job_edit(self):
         "Test job edit with POST request"
@@ -0,0 +1,126 @@
+"""
+Builds the table of contents of a data directory.
+
+The listing of each directory is stored together with the modification time of the directory.
+A directory with the same modification time is not listed again, only its subdirectories are visited.
+The file sizes are collected in the same scandir pass.
+
+Changing the content of a file in place does not change the directory,
+the sizes of such files are refreshed with a full rebuild.
+A directory modified just before a build may change again without a new modification time,
+its listing is not trusted by the next build.
+"""
+import json
+import logging
+import os
+import time
+
+from biostar.recipes.const import RACY_NS
+
+logger = logging.getLogger("engine")
+
+
+def state_path(tocname):
+    return f"{os.path.splitext(tocname)[0]}.json"
+
+
+def load_state(tocname):
+    try:
+        with open(state_path(tocname), 'rt') as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(tocname, state):
+    temp = f"{state_path(tocname)}.tmp"
+    with open(temp, 'wt') as fp:
+        json.dump(state, fp)
+    os.replace(temp, state_path(tocname))
+
+
+def scan(location, old, new):
+    """
+    Lists a directory into new, reusing the listing found in old when the directory did not change.
+    Returns the number of directories that were listed.
+    """
+    try:
+        mtime = os.stat(location).st_mtime_ns
+    except OSError as exc:
+        logger.error(exc)
+        return 0
+
+    entry = old.get(location)
+    listed = 0
+
+    if entry and entry[0] == mtime:
+        files, subdirs = entry[1], entry[2]
+    else:
+        files, subdirs = [], []
+        listed = 1
+        for item in os.scandir(location):
+            if item.is_dir():
+                subdirs.append(item.name)
+                continue
+            try:
+                size = item.stat().st_size if item.is_file() else 0
+            except OSError:
+                size = 0
+            files.append([item.name, size])
+
+    new[location] = [mtime, files, subdirs]
+
+    # Changes deeper in the tree do not change the modification time of this directory.
+    for name in subdirs:
+        listed += scan(os.path.join(location, name), old=old, new=new)
+
+    return listed
+
+
+def build(root, tocname, full=False):
+    """
+    Writes the table of contents of the root directory.
+    Returns the number of files and their total size.
+    """
+    old = {} if full else load_state(tocname)
+    new = {}
+
+    started = time.time_ns()
+    listed = scan(root, old=old, new=new)
+
+    collect, size = [], 0
+    for location, (mtime, files, subdirs) in new.items():
+        for name, fsize in files:
+            collect.append(os.path.abspath(os.path.join(location, name)))
+            size += fsize
+
+    # Nothing changed since the last build.
+    unchanged = not listed and new.keys() == old.keys() and os.path.isfile(tocname)
+
+    if not unchanged:
+        # Create a sorted file path collection.
+        collect.sort()
+        with open(tocname, 'w') as fp:
+            fp.write("\n".join(collect))
+
+        # Recently modified directories are listed again by the next build.
+        for entry in new.values():
+            if entry[0] > started - RACY_NS:
+                entry[0] = 0
+
+        save_state(tocname, new)
+
+    logger.debug(f"toc={tocname} files={len(collect)} listed={listed} directories")
+
+    return len(collect), size
+
+
+def is_stale(root, tocname):
+    """
+    True when the data directory itself changed since the table of contents was built.
+    """
+    entry = load_state(tocname).get(root)
+    try:
+        return not entry or entry[0] != os.stat(root).st_mtime_ns
+    except OSError:
+        return True
@@ -17,6 +17,7 @@ recipes_patterns = [
 
     # Ajax calls
     path(r'ajax/check/job/<str:uid>/', ajax.check_job, name='ajax_check_job'),
+    path(r'ajax/job/log/<str:uid>/', ajax.job_log, name='ajax_job_log'),
     path(r'preview/json/', ajax.preview_json, name="preview_json"),
     path(r'toggle/delete/', ajax.toggle_delete, name="toggle_delete"),
     path(r'manage/access/', ajax.manage_access, name="manage_access"),
@@ -26,7 +26,7 @@ from django.core.cache import cache
 from ratelimit.decorators import ratelimit
 from sendfile import sendfile
 from biostar.accounts.models import User
-from biostar.recipes import tasks, auth, forms, const, search, util
+from biostar.recipes import tasks, auth, forms, const, search, util, listing
 from biostar.recipes.decorators import read_access, write_access
 from biostar.recipes.models import Project, Data, Analysis, Job, Access
 
@@ -372,16 +372,40 @@ def project_create(request):
     return redirect(reverse("project_edit", kwargs=dict(uid=project.uid)))
 
 
+def file_page(request, root, use_cache=True):
+    """
+    Returns a page of the files below root and the directory being expanded.
+    A directory passed in the dir parameter is listed one level deep.
+    """
+    root = os.path.abspath(root)
+    folder = request.GET.get("dir", "")
+    sort = request.GET.get("sort", "name")
+    page = request.GET.get("page", 1)
+
+    # The path is normalized, data directories link to folders stored elsewhere.
+    node = join(root, folder)
+
+    # Only directories inside the root may be expanded.
+    inside = node == root or node.startswith(root + os.sep)
+    if not folder or not inside or not os.path.isdir(node):
+        folder, node = "", None
+
+    paths = listing.get_listing(root=root, node=node, show_all=not node, use_cache=use_cache)
+    paths = listing.get_page(paths, sort=sort, page=page)
+
+    return paths, folder, sort
+
+
 @read_access(type=Data)
 def data_view(request, uid):
     "Show information specific to each data."
 
     data = Data.objects.filter(uid=uid).first()
     project = data.project
-    paths = auth.listing(root=data.get_data_dir())
+    paths, folder, sort = file_page(request, root=data.get_data_dir())
 
     context = dict(data=data, project=project, paths=paths, serve_view="data_serve",
-                   activate='Selected Data', uid=data.uid, show_all=True)
+                   activate='Selected Data', uid=data.uid, show_all=True, folder=folder, sort=sort)
     counts = get_counts(project)
     context.update(counts)
 
@@ -709,21 +733,24 @@ def job_view(request, uid):
 
     stdout = job.stdout_log
     stderr = job.stderr_log
+    stdout_offset = stderr_offset = 0
     if job.is_running():
-        # Pass the most current stderr and stdout
+        # Pass the end of the current stderr and stdout, the page follows the logs from there.
         stdout_path = os.path.join(job.path, settings.JOB_STDOUT)
         stderr_path = os.path.join(job.path, settings.JOB_STDERR)
-        stdout = open(stdout_path, 'r').read()
-        stderr = open(stderr_path, 'r').read()
+        stdout, stdout_offset = auth.log_tail(stdout_path)
+        stderr, stderr_offset = auth.log_tail(stderr_path)
 
-    paths = auth.listing(root=job.get_data_dir())
+    # Files of a running job change without changing their directories.
+    paths, folder, sort = file_page(request, root=job.get_data_dir(), use_cache=not job.is_running())
 
     # Pass along any plugins this job has.
     plugin = job.json_data.get('settings', {}).get('plugin')
 
-    context = dict(job=job, project=project, stderr=stderr, stdout=stdout,uid=job.uid, show_all=True,
+    context = dict(job=job, project=project, stderr=stderr, stdout=stdout, stdout_offset=stdout_offset,
+                   stderr_offset=stderr_offset, uid=job.uid, show_all=True,
                    activate='View Result', paths=paths, serve_view="job_serve",
-                   plugin=plugin)
+                   plugin=plugin, folder=folder, sort=sort)
 
     counts = get_counts(project)
     context.update(counts)
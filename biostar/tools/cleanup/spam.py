@@ -9,11 +9,40 @@ from biostar.tools.config import *
 
 logger = logging.getLogger("engine")
 
+
+def classify_posts(admin, recent, limit, apply=False):
+    """
+    Classifies the recent posts that have not been labeled yet, in a single prediction.
+    """
+    from biostar.utils import spamlib
+    from biostar.forum import counters
+    from biostar.forum.models import queue_index
+
+    posts = Post.objects.filter(spam=Post.DEFAULT, creation_date__gt=recent).select_related("author__profile")
+    posts = list(posts.order_by("-pk")[:limit])
+
+    flags = spamlib.classify_batch([post.content for post in posts], model=settings.SPAM_MODEL)
+    found = [post for post, flag in zip(posts, flags) if flag]
+
+    for post in found:
+        logger.info(f"spam: user={post.author.profile.name}, title={post.title}")
+
+    logger.info(f"classified {len(posts)} posts, found {len(found)} spam")
+
+    if apply and found:
+        count = Post.objects.filter(id__in=[post.id for post in found]).update(spam=Post.SPAM, status=Post.CLOSED)
+        # Spam posts are removed from the search index.
+        queue_index(*[post.uid for post in found])
+        counters.incr(counters.SPAM, delta=count)
+        auth.db_logger(user=admin, text=f"spam cleanup, classified {len(found)} posts as spam")
+
+
 @plac.opt("limit", "limit ", abbrev="L")
 @plac.opt("days", "how far to go back in time", abbrev="d")
 @plac.flg("apply", "applies the action", abbrev='A')
+@plac.flg("classify", "classifies unlabeled posts with the spam model", abbrev='C')
 @plac.flg("verbose", "show debug messages")
-def main(apply=False, days=7, limit=10, verbose=False):
+def main(apply=False, days=7, limit=10, classify=False, verbose=False):
 
     # Increase verbosity
     if verbose:
@@ -24,6 +53,11 @@ def main(apply=False, days=7, limit=10, verbose=False):
 
     # Get the recently created spam
     recent = time_ago(days=days)
+
+    # Label the unclassified posts first.
+    if classify:
+        classify_posts(admin=admin, recent=recent, limit=limit, apply=apply)
+
     posts = Post.objects.filter(spam=Post.SPAM, creation_date__gt=recent).select_related("author__profile").order_by("-pk")
 
     # Apply the limit.
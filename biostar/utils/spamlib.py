@@ -18,6 +18,7 @@ seq 1 6 | parallel -j 1 wget -q -nc http://www.aueb.gr/users/ion/data/enron-spam
 '''
 import logging
 import sys, os
+import threading
 
 import plac
 from joblib import dump, load
@@ -29,23 +30,52 @@ from sklearn.pipeline import make_pipeline
 
 logger = logging.getLogger("engine")
 
+# Models loaded in this process, keyed by path and stored with the file modification time.
+MODELS = dict()
+MODEL_LOCK = threading.Lock()
+
+
 def load_model(model="spam.model"):
-    nb = load(model)
+    """
+    Loads the model once per process, and again when the file changes.
+    """
+    mtime = os.path.getmtime(model)
+
+    with MODEL_LOCK:
+        found = MODELS.get(model)
+        if found and found[0] == mtime:
+            return found[1]
+
+        logger.info(f"loading spam model: {model}")
+        nb = load(model)
+        MODELS[model] = (mtime, nb)
+
     return nb
 
 
-def classify_content(content, model):
+def classify_batch(contents, model):
     """
-    Classify content
+    Classify many contents with a single prediction.
     """
+    contents = list(contents)
+    if not contents:
+        return []
+
     try:
         nb = load_model(model)
-        y_pred = nb.predict([content])
+        y_pred = list(nb.predict(contents))
     except Exception as exc:
         logger.error(exc)
-        y_pred = [0]
+        y_pred = [0] * len(contents)
+
+    return y_pred
+
 
-    return y_pred[0]
+def classify_content(content, model):
+    """
+    Classify content
+    """
+    return classify_batch([content], model=model)[0]
 
 
 def fit_model(X, y):